@@ -1,10 +1,48 @@
-from flask import Flask, render_template, redirect, request, jsonify 
-from finch import Finch, APIError 
+from flask import Flask, render_template, stream_template, redirect, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import generate_etag
+from finch import Finch, AsyncFinch, APIError, APITimeoutError, DefaultHttpxClient, DefaultAsyncHttpxClient
+from finch.types.hris import Company, CompanyBenefit, IndividualInDirectory, PayStatement
+from finch.types.hris.employment_data import EmploymentDataResponseBody
+from finch.types.hris.individual import IndividualResponseBody
 from dotenv import load_dotenv
+import click
+import httpx
+import pydantic
 import os
+import re
+import asyncio
+import atexit
+import functools
+import itertools
+import logging
 import uuid
 import csv
-from datetime import datetime, timedelta
+import gzip
+import io
+import inspect
+import json
+import math
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from logging.handlers import QueueHandler, QueueListener
+from datetime import date, datetime, timedelta
+
+try:
+    import orjson
+except ImportError:  # Optional, the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional, only gzip is offered without it
+    brotli = None
 
 
 load_dotenv(dotenv_path='.env.local')
@@ -15,34 +53,270 @@ CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 REDIRECT_URI = os.getenv("REDIRECT_URI")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CSV_FILE_PATH = os.path.join(BASE_DIR, 'tokens.csv')
-JOBS_CSV_PATH = os.path.join(BASE_DIR, 'jobs.csv')
+# Where tokens, jobs and payment history are stored (the benchmark points this at a temp dir)
+DATA_DIR = os.getenv("DATA_DIR", BASE_DIR)
+CSV_FILE_PATH = os.path.join(DATA_DIR, 'tokens.csv')
+JOBS_CSV_PATH = os.path.join(DATA_DIR, 'jobs.csv')
+JOBS_DB_PATH = os.path.join(DATA_DIR, 'jobs.db')
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+PAYMENT_HISTORY_DB_PATH = os.path.join(DATA_DIR, 'payment_history.db')
+SNAPSHOT_DB_PATH = os.path.join(DATA_DIR, 'snapshots.db')
+# Answer /directory and the employee/deductions APIs from the local snapshot when one exists
+SERVE_FROM_SNAPSHOT = os.getenv("SERVE_FROM_SNAPSHOT", "false").lower() in ('1', 'true', 'yes')
+# Snapshot syncs get their own small pool so a large sync never queues ahead of request traffic
+SNAPSHOT_SYNC_WORKERS = int(os.getenv("SNAPSHOT_SYNC_WORKERS", "2"))
+FINCH_CLIENT_CACHE_SIZE = int(os.getenv("FINCH_CLIENT_CACHE_SIZE", "64"))
+# Same pool limits the Finch SDK uses by default
+FINCH_CONNECTION_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONNECTION_LOOKUP_WORKERS = int(os.getenv("CONNECTION_LOOKUP_WORKERS", "8"))
+CONNECTION_LOOKUP_TIMEOUT = float(os.getenv("CONNECTION_LOOKUP_TIMEOUT", "5"))
+COMPANY_CACHE_TTL = float(os.getenv("COMPANY_CACHE_TTL", "3600"))
+DIRECTORY_INDEX_TTL = float(os.getenv("DIRECTORY_INDEX_TTL", "300"))
+DIRECTORY_PAGE_SIZE = int(os.getenv("DIRECTORY_PAGE_SIZE", "500"))
+DIRECTORY_MAX_PAGE_SIZE = 10000
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", "8"))
+UPSTREAM_CALL_TIMEOUT = float(os.getenv("UPSTREAM_CALL_TIMEOUT", "30"))
+# Per-attempt timeout and retries for every Finch call (the SDK backs off with jitter and honours Retry-After)
+FINCH_REQUEST_TIMEOUT = float(os.getenv("FINCH_REQUEST_TIMEOUT", "20"))
+FINCH_MAX_RETRIES = int(os.getenv("FINCH_MAX_RETRIES", "2"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+CIRCUIT_MAX_COOLDOWN = float(os.getenv("CIRCUIT_MAX_COOLDOWN", "300"))
+# Serve the local snapshot (when there is one) while a provider's circuit is open
+CIRCUIT_SNAPSHOT_FALLBACK = os.getenv("CIRCUIT_SNAPSHOT_FALLBACK", "true").lower() in ('1', 'true', 'yes')
+RETRIEVE_MANY_CHUNK_SIZE = int(os.getenv("RETRIEVE_MANY_CHUNK_SIZE", "100"))
+EMPLOYEE_BATCH_MAX_IDS = int(os.getenv("EMPLOYEE_BATCH_MAX_IDS", "1000"))
+PAY_STATEMENT_CACHE_TTL = float(os.getenv("PAY_STATEMENT_CACHE_TTL", "900"))
+PAY_STATEMENT_CACHE_CONNECTIONS = int(os.getenv("PAY_STATEMENT_CACHE_CONNECTIONS", "16"))
+PAY_STATEMENT_CHUNK_SIZE = 10  # Finch accepts at most 10 payment_ids per retrieve_many
+PAY_STATEMENT_PAGE_SIZE = 5000
+EXPORT_PAY_STATEMENT_PAGE_SIZE = 1000
+DEFAULT_PAYMENT_WINDOW_DAYS = 90
+# Windows reaching today reuse a payment sync this recent instead of calling Finch again
+PAYMENT_SYNC_INTERVAL = float(os.getenv("PAYMENT_SYNC_INTERVAL", "60"))
+# Upstream batches an export fetches ahead of the rows being written
+EXPORT_READ_AHEAD = int(os.getenv("EXPORT_READ_AHEAD", "4"))
+JOB_POLL_MIN_INTERVAL = float(os.getenv("JOB_POLL_MIN_INTERVAL", "5"))
+JOB_POLL_MAX_INTERVAL = float(os.getenv("JOB_POLL_MAX_INTERVAL", "120"))
+JOB_STREAM_HEARTBEAT = float(os.getenv("JOB_STREAM_HEARTBEAT", "15"))
+JOB_ACTIVE_STATUSES = ('pending', 'in_progress')
+# Finch products the payroll and benefits features need
+PAYROLL_PRODUCTS = ('payment', 'pay_statement')
+BENEFITS_PRODUCTS = ('benefits',)
+# Bulk sync: job creations in flight per provider, and the default window (seconds) to spread starts over
+BULK_SYNC_PROVIDER_CONCURRENCY = int(os.getenv("BULK_SYNC_PROVIDER_CONCURRENCY", "2"))
+BULK_SYNC_WINDOW = float(os.getenv("BULK_SYNC_WINDOW", "0"))
+# How long a finished bulk sync's schedule stays available to GET /api/jobs/bulk-sync/<batch_id>
+BULK_SYNC_RETENTION = float(os.getenv("BULK_SYNC_RETENTION", "3600"))
+
+# Logging
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per log line"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging():
+    """Log through a queue so request threads never block on stdout
+
+    Debug-level payload dumps are only emitted when LOG_LEVEL=DEBUG.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonLogFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    app_logger = logging.getLogger('finch_demo')
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(QueueHandler(log_queue))
+    app_logger.propagate = False
+    return app_logger
+
+logger = configure_logging()
+
+# Connection Registry
+TOKENS_CSV_HEADERS = ['access_token', 'token_type', 'connection_id', 'customer_id',
+                      'account_id', 'client_type', 'company_id', 'connection_type',
+                      'products', 'provider_id', 'active']
+# Products are stored '|'-joined; a lone '|' records an empty grant, unlike an empty (never recorded) cell
+NO_PRODUCTS = '|'
+
+def parse_products(value):
+    """Products from a tokens.csv cell, or None when they were never recorded"""
+    if not value:
+        return None
+    return frozenset(product for product in value.split('|') if product)
+
+class ConnectionRegistry:
+    """Process-wide, in-memory view of tokens.csv
+
+    The file is parsed once and only re-read when its mtime or size changes.
+    Writes go through the registry so memory and disk stay in step.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._connections = []
+        self._by_id = {}
+        self._provider_by_token = {}
+        self._products_by_id = {}
+        self._active = None
+        self._signature = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _index(self, connections):
+        self._connections = connections
+        self._by_id = {conn['connection_id']: conn for conn in connections}
+        self._provider_by_token = {conn['access_token']: conn.get('provider_id') for conn in connections}
+        self._products_by_id = {conn['connection_id']: parse_products(conn.get('products')) for conn in connections}
+        self._active = None
+        for conn in connections:
+            if conn.get('active') == 'True':
+                self._active = conn
+                break
+        # If no active connection set, fall back to the most recent one
+        if self._active is None and connections:
+            self._active = connections[-1]
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+
+        connections = []
+        if signature is not None:
+            with open(self.path, mode='r', newline='', encoding='utf-8') as csvfile:
+                reader = csv.DictReader(csvfile)
+                for row in reader:
+                    connections.append(row)
+        self._index(connections)
+        self._signature = signature
+
+    def _write(self, connections):
+        """Atomically replace tokens.csv and the in-memory index"""
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tokens-', suffix='.csv')
+        try:
+            with os.fdopen(fd, mode='w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=TOKENS_CSV_HEADERS, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(connections)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._index(connections)
+        self._signature = self._file_signature()
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return [dict(conn) for conn in self._connections]
+
+    def get(self, connection_id):
+        with self._lock:
+            self._refresh()
+            conn = self._by_id.get(connection_id)
+            return dict(conn) if conn else None
+
+    def active(self):
+        with self._lock:
+            self._refresh()
+            return dict(self._active) if self._active else None
+
+    def provider_for_token(self, access_token):
+        """Provider for a token from the already-loaded index (no file check)"""
+        return self._provider_by_token.get(access_token)
+
+    def products(self, connection_id):
+        """Granted products for a connection, or None when they were never recorded"""
+        with self._lock:
+            self._refresh()
+            return self._products_by_id.get(connection_id)
+
+    def update_products(self, connection_id, products):
+        """Replace a connection's stored products (e.g. from introspect) without changing the active one"""
+        with self._lock:
+            self._refresh()
+            if connection_id not in self._by_id:
+                return False
+            connections = [dict(conn) for conn in self._connections]
+            for conn in connections:
+                if conn['connection_id'] == connection_id:
+                    conn['products'] = '|'.join(products) or NO_PRODUCTS
+            self._write(connections)
+            return True
+
+    def revoke_products(self, connection_id, products):
+        """Drop products Finch reported as missing from a connection's stored products"""
+        granted = self.products(connection_id)
+        if granted and granted & set(products):
+            self.update_products(connection_id, sorted(granted - set(products)))
+
+    def set_active(self, connection_id):
+        with self._lock:
+            self._refresh()
+            if connection_id not in self._by_id:
+                return False
+            connections = [dict(conn) for conn in self._connections]
+            for conn in connections:
+                conn['active'] = 'True' if conn['connection_id'] == connection_id else 'False'
+            self._write(connections)
+            return True
+
+    def upsert(self, connection):
+        """Add or update a connection and make it the active one
+
+        Returns True if the connection already existed.
+        """
+        connection_id = connection['connection_id']
+        with self._lock:
+            self._refresh()
+            existed = connection_id in self._by_id
+            connections = []
+            for conn in self._connections:
+                conn = dict(conn)
+                if conn['connection_id'] == connection_id:
+                    conn.update(connection)
+                conn['active'] = 'True' if conn['connection_id'] == connection_id else 'False'
+                connections.append(conn)
+            if not existed:
+                row = {header: '' for header in TOKENS_CSV_HEADERS}
+                row.update(connection)
+                row['active'] = 'True'
+                connections.append(row)
+            self._write(connections)
+            return existed
+
+connection_registry = ConnectionRegistry(CSV_FILE_PATH)
 
 def get_all_connections():
-    """Get all connections from CSV file"""
-    if not os.path.exists(CSV_FILE_PATH):
-        return []
-    
-    connections = []
-    with open(CSV_FILE_PATH, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            connections.append(row)
-    return connections
+    """Get all connections from the registry"""
+    return connection_registry.all()
 
 def get_active_connection():
     """Get the currently active connection"""
-    connections = get_all_connections()
-    if not connections:
-        return None
-    
-    # Look for active connection first
-    for conn in connections:
-        if conn.get('active') == 'True':
-            return conn
-    
-    # If no active connection set, return the most recent one
-    return connections[-1]
+    return connection_registry.active()
 
 def get_latest_access_token():
     """Get access token for active connection"""
@@ -53,143 +327,2481 @@ def get_latest_access_token():
 
 def set_active_connection(connection_id):
     """Set a connection as active"""
-    connections = get_all_connections()
-    if not connections:
+    return connection_registry.set_active(connection_id)
+
+# Product Scopes
+def missing_products(connection, required):
+    """Products in `required` the connection was not granted
+
+    Empty when the connection's products were never recorded, since then the
+    call has to be made to find out.
+    """
+    granted = connection_registry.products(connection['connection_id']) if connection else None
+    if granted is None:
+        return []
+    return [product for product in required if product not in granted]
+
+def missing_scopes_from_error(error):
+    """Missing scopes from a Finch 403 insufficient_scope_error, or None for any other error"""
+    if getattr(error, 'status_code', None) != 403:
+        return None
+    error_body = getattr(error, 'body', {})
+    if not isinstance(error_body, dict) or error_body.get('name') != 'insufficient_scope_error':
+        return None
+    # Parse something like "Missing scopes: [benefits]"
+    scope_match = re.search(r'Missing scopes:\s*\[([^\]]+)\]', error_body.get('message', ''))
+    if not scope_match:
+        return []
+    return [scope.strip().strip('"\'') for scope in scope_match.group(1).split(',')]
+
+def insufficient_scope_response(missing_scopes, connection):
+    """403 telling the frontend which scopes to reauthorize the connection for"""
+    connection_id = connection['connection_id'] if connection else None
+    return jsonify({
+        'error_type': 'insufficient_scope',
+        'missing_scopes': missing_scopes,
+        'reauth_url': f'/reauth/{connection_id}' if connection_id else None,
+        'message': f'Additional permissions needed: {", ".join(missing_scopes)}' if missing_scopes else 'Additional permissions needed',
+        'connection_id': connection_id
+    }), 403
+
+def requires_products(*products):
+    """Answer a route with the insufficient_scope 403 when the active connection
+    was not granted `products`, without making the doomed Finch call"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            connection = get_active_connection()
+            missing = missing_products(connection, products)
+            if missing:
+                scope_checks_skipped.inc(route=request.url_rule.rule if request.url_rule else 'unmatched')
+                return insufficient_scope_response(missing, connection)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def accepts_fields(view):
+    """Answer a route with a 400 when its ?fields= projection is malformed"""
+    def invalid_fields():
+        try:
+            parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': f'Invalid fields: {e}'}), 400
+        return None
+
+    if inspect.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            return invalid_fields() or await view(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        return invalid_fields() or view(*args, **kwargs)
+    return wrapper
+
+# Metrics
+class Counter:
+    """Prometheus-style counter with labels"""
+
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_metric_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """Prometheus-style histogram with labels and fixed buckets"""
+
+    def __init__(self, name, help_text, labelnames, buckets=METRIC_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    labels = format_metric_labels(self.labelnames + ('le',), key + (str(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = format_metric_labels(self.labelnames + ('le',), key + ('+Inf',))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = format_metric_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+def format_metric_labels(labelnames, values):
+    """Render a Prometheus label set, escaping values"""
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+route_duration = Histogram(
+    'finch_demo_request_duration_seconds',
+    'Time spent handling a Flask route until the response is returned',
+    ('route', 'method', 'status'))
+route_errors = Counter(
+    'finch_demo_request_errors_total',
+    'Flask responses with a 5xx status',
+    ('route', 'method', 'status'))
+upstream_duration = Histogram(
+    'finch_demo_upstream_duration_seconds',
+    'Time spent on each Finch API call (every attempt, including SDK retries)',
+    ('upstream', 'provider_id', 'status'))
+upstream_errors = Counter(
+    'finch_demo_upstream_errors_total',
+    'Finch API calls that failed with a 4xx/5xx status or a transport error',
+    ('upstream', 'provider_id', 'status'))
+upstream_circuit_opens = Counter(
+    'finch_demo_upstream_circuit_opens_total',
+    'Times a provider circuit opened after upstream failures',
+    ('provider_id',))
+scope_checks_skipped = Counter(
+    'finch_demo_scope_checks_skipped_total',
+    'Requests answered with insufficient_scope from stored products, without calling Finch',
+    ('route',))
+upstream_coalesced = Counter(
+    'finch_demo_upstream_coalesced_total',
+    'Finch API calls answered by an identical call already in flight',
+    ('upstream',))
+METRICS = [route_duration, route_errors, upstream_duration, upstream_errors, upstream_circuit_opens,
+           upstream_coalesced, scope_checks_skipped]
+
+# Maps Finch API paths to the SDK method that calls them, keeping label values bounded
+UPSTREAM_METHODS = [
+    ('GET', re.compile(r'^/employer/company$'), 'hris.company.retrieve'),
+    ('GET', re.compile(r'^/employer/directory$'), 'hris.directory.list'),
+    ('POST', re.compile(r'^/employer/individual$'), 'hris.individuals.retrieve_many'),
+    ('POST', re.compile(r'^/employer/employment$'), 'hris.employments.retrieve_many'),
+    ('GET', re.compile(r'^/employer/payment$'), 'hris.payments.list'),
+    ('POST', re.compile(r'^/employer/pay-statement$'), 'hris.pay_statements.retrieve_many'),
+    ('GET', re.compile(r'^/employer/benefits$'), 'hris.benefits.list'),
+    ('GET', re.compile(r'^/employer/benefits/[^/]+/enrolled$'), 'hris.benefits.individuals.enrolled_ids'),
+    ('POST', re.compile(r'^/jobs/automated$'), 'jobs.automated.create'),
+    ('GET', re.compile(r'^/jobs/automated/[^/]+$'), 'jobs.automated.retrieve'),
+    ('GET', re.compile(r'^/introspect$'), 'account.introspect'),
+    ('POST', re.compile(r'^/auth/token$'), 'access_tokens.create'),
+    ('POST', re.compile(r'^/connect/sessions$'), 'connect.sessions.new'),
+    ('POST', re.compile(r'^/connect/sessions/reauthenticate$'), 'connect.sessions.reauthenticate'),
+]
+
+def upstream_method_name(method, path):
+    for upstream_method, pattern, name in UPSTREAM_METHODS:
+        if method == upstream_method and pattern.match(path):
+            return name
+    return 'other'
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """httpx transport that times every Finch API call
+
+    Calls are labelled with the SDK method, the provider of the connection
+    whose token made the call, and the response status (or error type).
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def handle_request(self, request):
+        labels = upstream_labels(request)
+        started = time.perf_counter()
+        rejected = upstream_circuit.reject(request, labels['provider_id'])
+        if rejected is not None:
+            record_upstream_call(labels, started, 'circuit_open')
+            return rejected
+        try:
+            response = self.transport.handle_request(request)
+        except Exception as e:
+            record_upstream_call(labels, started, type(e).__name__)
+            upstream_circuit.record(labels['provider_id'], failed=True)
+            raise
+        except BaseException:
+            # Cancelled, so the provider gave no answer either way
+            upstream_circuit.release(labels['provider_id'], request)
+            raise
+        record_upstream_call(labels, started, response.status_code)
+        upstream_circuit.record_response(labels['provider_id'], response)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+class AsyncInstrumentedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of InstrumentedTransport for AsyncFinch clients"""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        labels = upstream_labels(request)
+        started = time.perf_counter()
+        rejected = upstream_circuit.reject(request, labels['provider_id'])
+        if rejected is not None:
+            record_upstream_call(labels, started, 'circuit_open')
+            return rejected
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception as e:
+            record_upstream_call(labels, started, type(e).__name__)
+            upstream_circuit.record(labels['provider_id'], failed=True)
+            raise
+        except BaseException:
+            # Cancelled, so the provider gave no answer either way
+            upstream_circuit.release(labels['provider_id'], request)
+            raise
+        record_upstream_call(labels, started, response.status_code)
+        upstream_circuit.record_response(labels['provider_id'], response)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def provider_for_authorization(authorization):
+    if not authorization.startswith('Bearer '):
+        return 'none'
+    return connection_registry.provider_for_token(authorization[len('Bearer '):]) or 'unknown'
+
+def upstream_labels(request):
+    return {
+        'upstream': upstream_method_name(request.method, request.url.path),
+        'provider_id': provider_for_authorization(request.headers.get('Authorization', ''))
+    }
+
+def record_upstream_call(labels, started, status):
+    """Time one upstream call; status is the HTTP status or the exception class name"""
+    upstream_duration.observe(time.perf_counter() - started, status=status, **labels)
+    if not isinstance(status, int) or status >= 400:
+        upstream_errors.inc(status=status, **labels)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'route': route, 'method': request.method, 'status': response.status_code}
+        route_duration.observe(time.perf_counter() - started, **labels)
+        if response.status_code >= 500:
+            route_errors.inc(**labels)
+    return response
+
+# Upstream Circuit Breaker
+class CircuitBreaker:
+    """Per-provider_id circuit breaker for Finch API calls
+
+    After `threshold` consecutive failures (transport errors, 429, or 5xx
+    other than 501) a provider's circuit opens and its calls fail fast with a
+    synthetic 503 the SDK does not retry. After the cooldown one call is let
+    through as a probe: success closes the circuit, failure reopens it for
+    twice as long (up to `max_cooldown`). A 429 with Retry-After keeps it
+    open for at least that long. A probe that is cancelled, or has not
+    reported back within `probe_timeout`, hands the slot to the next call.
+    """
+
+    def __init__(self, threshold, cooldown, max_cooldown, probe_timeout):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def _retry_in(self, provider_id, request):
+        """Seconds until calls to a provider are allowed again, or None if they are (call with the lock held)"""
+        state = self._providers.get(provider_id)
+        if state is None or state['open_until'] is None:
+            return None
+        now = time.monotonic()
+        remaining = state['open_until'] - now
+        if remaining > 0:
+            return remaining
+        if state['probe'] is not None and now - state['probe'][1] < self.probe_timeout:
+            # One probe at a time, the rest keep failing fast until it reports back
+            return 1.0
+        state['probe'] = (request, now)
+        return None
+
+    def is_open(self, provider_id):
+        with self._lock:
+            state = self._providers.get(provider_id)
+            return state is not None and state['open_until'] is not None
+
+    def reject(self, request, provider_id):
+        """Synthetic 503 response if the provider's circuit is open, else None"""
+        if provider_id in ('none', 'unknown'):
+            return None
+        with self._lock:
+            retry_in = self._retry_in(provider_id, request)
+        if retry_in is None:
+            return None
+        return httpx.Response(
+            503,
+            headers={'x-should-retry': 'false', 'x-circuit-open': 'true', 'retry-after': str(math.ceil(retry_in))},
+            json={'code': 503, 'name': 'circuit_open',
+                  'message': f"{provider_id} is failing, calls are paused for {math.ceil(retry_in)}s"},
+            request=request)
+
+    def record_response(self, provider_id, response):
+        status = response.status_code
+        failed = status == 429 or (status >= 500 and status != 501)
+        retry_after = None
+        if status == 429:
+            try:
+                retry_after = float(response.headers.get('retry-after', ''))
+            except ValueError:
+                pass
+        self.record(provider_id, failed, retry_after)
+
+    def release(self, provider_id, request):
+        """Free the probe slot if this request held it, without counting a result"""
+        with self._lock:
+            state = self._providers.get(provider_id)
+            if state is not None and state['probe'] is not None and state['probe'][0] is request:
+                state['probe'] = None
+
+    def record(self, provider_id, failed, retry_after=None):
+        if provider_id in ('none', 'unknown'):
+            return
+        with self._lock:
+            state = self._providers.get(provider_id)
+            if not failed:
+                if state is not None:
+                    if state['open_until'] is not None:
+                        logger.info("Circuit for %s closed", provider_id)
+                    del self._providers[provider_id]
+                return
+            if state is None:
+                state = self._providers[provider_id] = {
+                    'failures': 0, 'open_until': None, 'cooldown': self.cooldown, 'probe': None}
+            state['failures'] += 1
+            probing = state['probe'] is not None
+            if not (probing or retry_after or state['failures'] >= self.threshold):
+                return
+            if probing:
+                state['cooldown'] = min(state['cooldown'] * 2, self.max_cooldown)
+            cooldown = max(state['cooldown'], retry_after or 0)
+            state['open_until'] = time.monotonic() + cooldown
+            state['probe'] = None
+        logger.warning("Circuit for %s opened for %.0fs after %d failures", provider_id, cooldown, state['failures'])
+        upstream_circuit_opens.inc(provider_id=provider_id)
+
+upstream_circuit = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN, CIRCUIT_MAX_COOLDOWN,
+                                  probe_timeout=FINCH_REQUEST_TIMEOUT)
+
+def is_circuit_open_error(error):
+    """True for the fail-fast error raised while a provider's circuit is open"""
+    response = getattr(error, 'response', None)
+    return response is not None and response.headers.get('x-circuit-open') == 'true'
+
+# Finch Client Pool
+class FinchClientPool:
+    """Bounded LRU of Finch clients keyed by access token
+
+    All clients share one HTTP connection pool, so keep-alive connections and
+    TLS sessions are reused across requests instead of being rebuilt per route.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._http_client = None
+        self._oauth_client = None
+
+    def _shared_http_client(self):
+        if self._http_client is None:
+            transport = InstrumentedTransport(httpx.HTTPTransport(limits=FINCH_CONNECTION_LIMITS))
+            self._http_client = DefaultHttpxClient(transport=transport)
+        return self._http_client
+
+    def oauth_client(self):
+        """Shared client for the client-credential routes (connect, reauth, authorize)"""
+        with self._lock:
+            if self._oauth_client is None:
+                self._oauth_client = Finch(
+                    client_id=CLIENT_ID,
+                    client_secret=CLIENT_SECRET,
+                    http_client=self._shared_http_client(),
+                    timeout=FINCH_REQUEST_TIMEOUT,
+                    max_retries=FINCH_MAX_RETRIES
+                )
+            return self._oauth_client
+
+    def get(self, access_token):
+        with self._lock:
+            client = self._clients.get(access_token)
+            if client is not None:
+                self._clients.move_to_end(access_token)
+                return client
+
+            client = Finch(access_token=access_token, http_client=self._shared_http_client(),
+                           timeout=FINCH_REQUEST_TIMEOUT, max_retries=FINCH_MAX_RETRIES)
+            self._clients[access_token] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+            return client
+
+    def evict(self, access_token):
+        with self._lock:
+            self._clients.pop(access_token, None)
+
+finch_clients = FinchClientPool(FINCH_CLIENT_CACHE_SIZE)
+
+def get_finch_client(access_token=None):
+    """Get a pooled Finch client, defaulting to the active connection's token"""
+    if access_token is None:
+        access_token = get_latest_access_token()
+    return finch_clients.get(access_token)
+
+# Async Upstream Loop
+class AsyncUpstream:
+    """One background event loop shared by every async view and AsyncFinch call
+
+    Async views run on this loop instead of on a new loop per request, so the
+    pooled AsyncFinch clients and their keep-alive connections are reused, and
+    a request's independent upstream calls can be awaited together.
+    """
+
+    def __init__(self, max_clients):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._loop = None
+        self._clients = OrderedDict()
+        self._http_client = None
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='async-upstream', daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and wait for its result
+
+        The caller's context variables (including Flask's request context)
+        are carried over to the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop()).result()
+
+    def client(self, access_token):
+        """Pooled AsyncFinch client for a token; only await it on the upstream loop"""
+        with self._lock:
+            client = self._clients.get(access_token)
+            if client is not None:
+                self._clients.move_to_end(access_token)
+                return client
+
+            if self._http_client is None:
+                transport = AsyncInstrumentedTransport(httpx.AsyncHTTPTransport(limits=FINCH_CONNECTION_LIMITS))
+                self._http_client = DefaultAsyncHttpxClient(transport=transport)
+            client = AsyncFinch(access_token=access_token, http_client=self._http_client,
+                                timeout=FINCH_REQUEST_TIMEOUT, max_retries=FINCH_MAX_RETRIES)
+            self._clients[access_token] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+            return client
+
+    def evict(self, access_token):
+        with self._lock:
+            self._clients.pop(access_token, None)
+
+async_upstream = AsyncUpstream(FINCH_CLIENT_CACHE_SIZE)
+
+def run_async_view(func):
+    """Run an async view on the shared upstream loop (Flask's default needs asgiref and a loop per request)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return async_upstream.run(func(*args, **kwargs))
+    return wrapper
+
+app.async_to_sync = run_async_view
+
+def get_async_finch_client(access_token=None):
+    """Get a pooled AsyncFinch client, defaulting to the active connection's token"""
+    if access_token is None:
+        access_token = get_latest_access_token()
+    return async_upstream.client(access_token)
+
+class ParallelFetch:
+    """Request-scoped set of independent upstream calls awaited together
+
+    Each call gets its own timeout and its failure is captured instead of
+    raised, so one slow or broken call never hides the others' results:
+
+        fetch = ParallelFetch()
+        fetch.add('company', lambda: client.hris.company.retrieve(), timeout=5)
+        results = await fetch.run()  # {'company': (value, error)}
+    """
+
+    def __init__(self, timeout=UPSTREAM_CALL_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+
+    def add(self, name, call, timeout=None):
+        """Add a call: a zero-argument function returning an awaitable"""
+        self._calls[name] = (call, self.timeout if timeout is None else timeout)
+        return self
+
+    async def _run_one(self, name, call, timeout):
+        try:
+            return await asyncio.wait_for(call(), timeout), None
+        except Exception as e:
+            logger.debug("Parallel fetch %r failed: %r", name, e)
+            return None, e
+
+    async def run(self):
+        """Await every call at once; total latency is the slowest call, not the sum"""
+        names = list(self._calls)
+        results = await asyncio.gather(*(
+            self._run_one(name, call, timeout) for name, (call, timeout) in self._calls.items()))
+        return dict(zip(names, results))
+
+def upstream_error_message(error, data_label):
+    """User-facing message for a failed upstream call, logged as a warning"""
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError)):
+        message = f"Timed out loading {data_label.lower()} data."
+    elif isinstance(error, APIError) and getattr(error, 'status_code', None) == 501:
+        message = f"{data_label} data unsupported for provider"
+    elif is_circuit_open_error(error):
+        message = f"The provider is not responding, {data_label.lower()} data is paused for a moment."
+    elif isinstance(error, APIError) and getattr(error, 'status_code', None) == 429:
+        message = f"Rate limited loading {data_label.lower()} data, try again shortly."
+    elif isinstance(error, APIError):
+        message = f"Could not load {data_label.lower()} data."
+    else:
+        message = "Encountered an unexpected error."
+    logger.warning("%s (%s)", message, error)
+    return message
+
+def provider_unavailable_response(error):
+    """JSON error with Retry-After while a provider is rate limiting us or its circuit is open, else None"""
+    if is_circuit_open_error(error):
+        message, status_code = "The provider is not responding, calls to it are paused for a moment", 503
+    elif getattr(error, 'status_code', None) == 429:
+        message, status_code = "Rate limited by the provider, try again shortly", 429
+    else:
+        return None
+    logger.warning("%s (%s)", message, error)
+    response = jsonify({'error': message})
+    response.status_code = status_code
+    retry_after = error.response.headers.get('retry-after')
+    if retry_after:
+        response.headers['Retry-After'] = retry_after
+    return response
+
+# Request Coalescing
+class SingleFlight:
+    """Shares one in-flight call among identical concurrent callers
+
+    Keys are (connection_id, upstream method, *params). The first caller for
+    a key makes the call; callers arriving before it finishes wait for it and
+    get the same result or exception. Nothing is kept afterwards, so the next
+    call goes upstream again. Sync and async callers share the same flights.
+    A leader that is cancelled (or otherwise stopped by a BaseException)
+    leaves its followers with an APITimeoutError, which the routes already
+    handle, rather than a CancelledError.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def _join(self, key):
+        """The key's in-flight future, and whether this caller has to make the call"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                upstream_coalesced.inc(upstream=key[1])
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def _land(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._flights[key]
+        if error is not None and not isinstance(error, Exception):
+            error = APITimeoutError(request=httpx.Request('GET', f"coalesced:{key[1]}"))
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, call):
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+    async def do_async(self, key, call):
+        """do() for a call returning an awaitable; waiting never blocks the event loop"""
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded, so a follower being cancelled never cancels the shared flight
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await call()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+upstream_flights = SingleFlight()
+
+def coalesced(connection, method, call, *params):
+    """call() shared with identical concurrent calls for the same connection"""
+    if connection is None:
+        return call()
+    return upstream_flights.do((connection['connection_id'], method, *params), call)
+
+async def coalesced_async(connection, method, call, *params):
+    """Async coalesced(), for awaitable calls"""
+    if connection is None:
+        return await call()
+    return await upstream_flights.do_async((connection['connection_id'], method, *params), call)
+
+# Company Data Cache
+background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='background-refresh')
+
+class ConnectionCache:
+    """Per-connection_id values (company data, directory index) with stale-while-revalidate
+
+    Fresh entries are returned directly. Stale entries are still returned
+    immediately while a single background refresh replaces them.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generations = {}
+        self._refreshing = set()
+
+    def get(self, connection_id, fetch, refresh=None):
+        """Cached value, fetching on a miss; stale entries refresh in the background with refresh (default fetch)"""
+        with self._lock:
+            entry = self._entries.get(connection_id)
+
+        if entry is None:
+            return self._store(connection_id, self._generation(connection_id), fetch())
+
+        value, fetched_at = entry
+        if time.monotonic() - fetched_at > self.ttl:
+            self._refresh_in_background(connection_id, refresh or fetch)
+        return value
+
+    def peek(self, connection_id, fetch):
+        """Cached value or None, never fetching in the caller (stale values still refresh in the background)"""
+        with self._lock:
+            entry = self._entries.get(connection_id)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        if time.monotonic() - fetched_at > self.ttl:
+            self._refresh_in_background(connection_id, fetch)
+        return value
+
+    def generation(self, connection_id):
+        """Token for put(); an invalidate() in between makes the put a no-op"""
+        return self._generation(connection_id)
+
+    def put(self, connection_id, value, generation):
+        return self._store(connection_id, generation, value)
+
+    async def get_async(self, connection_id, fetch_async, fetch):
+        """Like get(), but a miss is awaited; stale entries still refresh in the background with fetch"""
+        with self._lock:
+            entry = self._entries.get(connection_id)
+
+        if entry is None:
+            generation = self._generation(connection_id)
+            return self._store(connection_id, generation, await fetch_async())
+
+        value, fetched_at = entry
+        if time.monotonic() - fetched_at > self.ttl:
+            self._refresh_in_background(connection_id, fetch)
+        return value
+
+    def invalidate(self, connection_id):
+        with self._lock:
+            self._entries.pop(connection_id, None)
+            # Any refresh already in flight belongs to the old generation and is discarded
+            self._generations[connection_id] = self._generations.get(connection_id, 0) + 1
+
+    def _generation(self, connection_id):
+        with self._lock:
+            return self._generations.get(connection_id, 0)
+
+    def _store(self, connection_id, generation, value):
+        with self._lock:
+            if self._generations.get(connection_id, 0) == generation:
+                self._entries[connection_id] = (value, time.monotonic())
+        return value
+
+    def _refresh_in_background(self, connection_id, fetch):
+        with self._lock:
+            if connection_id in self._refreshing:
+                return
+            self._refreshing.add(connection_id)
+            generation = self._generations.get(connection_id, 0)
+
+        def refresh():
+            try:
+                self._store(connection_id, generation, fetch())
+            except Exception as e:
+                logger.warning("Cache refresh failed for %s: %s", connection_id, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(connection_id)
+
+        background_executor.submit(refresh)
+
+company_cache = ConnectionCache(COMPANY_CACHE_TTL)
+
+def get_company_data(connection=None, timeout=None):
+    """Get company data for a connection (defaults to the active one) through the cache"""
+    if connection is None:
+        connection = get_active_connection()
+    client = refresh_client = get_finch_client(connection['access_token'] if connection else None)
+    if timeout is not None:
+        # Only the caller waiting on a miss is cut short, background refreshes keep the usual timeout and retries
+        client = client.with_options(timeout=timeout, max_retries=0)
+    if not connection:
+        return client.hris.company.retrieve()
+    return company_cache.get(
+        connection['connection_id'],
+        lambda: coalesced(connection, 'hris.company.retrieve', client.hris.company.retrieve),
+        lambda: coalesced(connection, 'hris.company.retrieve', refresh_client.hris.company.retrieve))
+
+async def get_company_data_async(connection=None):
+    """Async get_company_data, for use in async views"""
+    if connection is None:
+        connection = await asyncio.to_thread(get_active_connection)
+    access_token = connection['access_token'] if connection else None
+    client = get_async_finch_client(access_token)
+    if not connection:
+        return await client.hris.company.retrieve()
+    sync_client = get_finch_client(access_token)
+    return await company_cache.get_async(
+        connection['connection_id'],
+        lambda: coalesced_async(connection, 'hris.company.retrieve', client.hris.company.retrieve),
+        lambda: coalesced(connection, 'hris.company.retrieve', sync_client.hris.company.retrieve))
+
+def get_connection_details(connection, timeout=None):
+    """Get provider and company details for a connection"""
+    try:
+        company_data = get_company_data(connection, timeout=timeout)
+        return {
+            'company_name': company_data.legal_name or 'Unknown Company',
+            'status': 'Active'
+        }
+    except APITimeoutError:
+        return {
+            'company_name': 'Unknown Company',
+            'status': 'Timeout'
+        }
+    except Exception as e:
+        return {
+            'company_name': 'Unknown Company',
+            'status': 'Error'
+        }
+
+connection_lookup_executor = ThreadPoolExecutor(
+    max_workers=CONNECTION_LOOKUP_WORKERS,
+    thread_name_prefix='connection-lookup'
+)
+
+def get_all_connection_details(connections):
+    """Look up details for every connection concurrently, in connection order
+
+    Each lookup has its own timeout; anything still outstanding when the
+    render deadline passes is reported as a Timeout instead of blocking.
+    """
+    futures = [
+        connection_lookup_executor.submit(get_connection_details, conn, CONNECTION_LOOKUP_TIMEOUT)
+        for conn in connections
+    ]
+    if not futures:
+        return []
+
+    # Lookups queue behind the pool, so allow one timeout per wave of workers
+    waves = math.ceil(len(futures) / CONNECTION_LOOKUP_WORKERS)
+    wait(futures, timeout=CONNECTION_LOOKUP_TIMEOUT * waves)
+
+    details = []
+    for future in futures:
+        if future.done():
+            details.append(future.result())
+        else:
+            future.cancel()
+            details.append({
+                'company_name': 'Unknown Company',
+                'status': 'Timeout'
+            })
+    return details
+
+# Directory Loading
+def directory_has_more(page, offset, page_size):
+    """Whether another page follows a page that ended at offset"""
+    individuals = page.individuals or []
+    count = page.paging.count if page.paging else None
+    if not individuals:
         return False
-    
-    # Update active status
-    for conn in connections:
-        conn['active'] = 'True' if conn['connection_id'] == connection_id else 'False'
-    
-    # Write back to CSV
-    header = ['access_token', 'token_type', 'connection_id', 'customer_id',
-              'account_id', 'client_type', 'company_id', 'connection_type',
-              'products', 'provider_id', 'active']
-    
-    with open(CSV_FILE_PATH, mode='w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=header)
-        writer.writeheader()
-        writer.writerows(connections)
-    
+    if count is not None:
+        return offset < count
+    return len(individuals) >= page_size
+
+def iter_directory_pages(client, page_size=DIRECTORY_PAGE_SIZE, offset=0):
+    """Yield directory pages, walking offset/limit until every individual is fetched"""
+    while True:
+        page = client.hris.directory.list(offset=offset, limit=page_size)
+        yield page
+
+        offset += len(page.individuals or [])
+        if not directory_has_more(page, offset, page_size):
+            return
+
+def iter_directory(client, page_size=DIRECTORY_PAGE_SIZE):
+    """Yield every individual in the directory, one page in memory at a time"""
+    for page in iter_directory_pages(client, page_size):
+        yield from page.individuals or []
+
+class DirectoryStream:
+    """Lazily iterates the full directory while the template renders
+
+    The first page is fetched up front (or passed in, already fetched) so
+    request errors and the employee count are known before any HTML is sent;
+    later pages are fetched as the rows are written out.
+    """
+
+    def __init__(self, client, page_size=DIRECTORY_PAGE_SIZE, first_page=None, on_complete=None):
+        self._on_complete = on_complete
+        if first_page is None:
+            first_page = client.hris.directory.list(offset=0, limit=page_size)
+        self._first_page = first_page
+        individuals = first_page.individuals or []
+        if directory_has_more(first_page, len(individuals), page_size):
+            self._pages = iter_directory_pages(client, page_size, offset=len(individuals))
+        else:
+            self._pages = iter(())
+        paging = first_page.paging
+        self.total = paging.count if paging and paging.count is not None else len(individuals)
+        self.error = None
+        self._has_rows = bool(individuals)
+
+    def __bool__(self):
+        return self._has_rows
+
+    def __iter__(self):
+        seen = [] if self._on_complete else None
+        page, self._first_page = self._first_page, None
+        pages = self._pages if page is None else itertools.chain([page], self._pages)
+        try:
+            for page in pages:
+                individuals = page.individuals or []
+                if seen is not None:
+                    seen.extend(individuals)
+                yield from individuals
+        except Exception as e:
+            # Headers are already sent, so report the truncation inside the page
+            self.error = "Could not load the rest of the directory."
+            logger.warning("%s (%s)", self.error, e)
+            return
+        if seen is not None:
+            # The whole directory went by, hand it on (e.g. to the directory index cache)
+            self._on_complete(seen)
+
+def directory_individual_to_dict(individual):
+    """Convert a directory entry into a JSON-friendly dict"""
+    employee_data = {
+        'id': individual.id,
+        'first_name': getattr(individual, 'first_name', None),
+        'middle_name': getattr(individual, 'middle_name', None),
+        'last_name': getattr(individual, 'last_name', None),
+        'preferred_name': getattr(individual, 'preferred_name', None),
+        'is_active': getattr(individual, 'is_active', None),
+        'department': None,
+        'manager': None
+    }
+
+    # Add department info if available
+    if hasattr(individual, 'department') and individual.department:
+        employee_data['department'] = {
+            'name': getattr(individual.department, 'name', None)
+        }
+
+    # Add manager info if available
+    if hasattr(individual, 'manager') and individual.manager:
+        employee_data['manager'] = {
+            'id': getattr(individual.manager, 'id', None)
+        }
+
+    return employee_data
+
+class DirectoryIndex:
+    """Lookups over one full directory download: by id, manager id and department name"""
+
+    def __init__(self, individuals):
+        self.individuals = list(individuals)
+        self.by_id = {}
+        self.by_manager = {}
+        self.by_department = {}
+        self._search_text = {}
+        for individual in self.individuals:
+            self.by_id[individual.id] = individual
+            manager_id = getattr(individual.manager, 'id', None) if getattr(individual, 'manager', None) else None
+            if manager_id:
+                self.by_manager.setdefault(manager_id, []).append(individual)
+            department = getattr(individual.department, 'name', None) if getattr(individual, 'department', None) else None
+            if department:
+                self.by_department.setdefault(department.casefold(), []).append(individual)
+            self._search_text[individual.id] = ' '.join(
+                value for value in (individual.id, getattr(individual, 'first_name', None),
+                                    getattr(individual, 'preferred_name', None),
+                                    getattr(individual, 'last_name', None), department)
+                if value).casefold()
+
+    def __len__(self):
+        return len(self.individuals)
+
+    def get(self, individual_id):
+        return self.by_id.get(individual_id)
+
+    def reports(self, manager_id):
+        return self.by_manager.get(manager_id, [])
+
+    def in_department(self, department):
+        return self.by_department.get(department.casefold(), [])
+
+    def search(self, query=None, department=None, manager_id=None, is_active=None):
+        """Individuals matching every given filter, in directory order
+
+        query matches (case-insensitively) within the name, id or department.
+        """
+        if department:
+            candidates = self.in_department(department)
+        elif manager_id:
+            candidates = self.reports(manager_id)
+        else:
+            candidates = self.individuals
+        terms = query.casefold().split() if query else []
+
+        results = []
+        for individual in candidates:
+            if manager_id and (getattr(individual.manager, 'id', None) if individual.manager else None) != manager_id:
+                continue
+            if is_active is not None and getattr(individual, 'is_active', None) != is_active:
+                continue
+            text = self._search_text[individual.id]
+            if all(term in text for term in terms):
+                results.append(individual)
+        return results
+
+directory_index_cache = ConnectionCache(DIRECTORY_INDEX_TTL)
+
+def get_directory_index(connection=None):
+    """Cached DirectoryIndex for a connection (defaults to the active one)"""
+    if connection is None:
+        connection = get_active_connection()
+    client = get_finch_client(connection['access_token'] if connection else None)
+    load = lambda: DirectoryIndex(iter_directory(client))
+    if not connection:
+        return load()
+    # A whole-directory walk, shared by every request that misses the cache at once
+    return directory_index_cache.get(connection['connection_id'],
+                                     lambda: coalesced(connection, 'hris.directory.list', load, 'all'))
+
+def enrolled_individual_records(individual_ids, directory_index):
+    """Directory details for enrolled individuals, joined through a DirectoryIndex
+
+    Individuals missing from the directory still get a minimal record; without
+    an index (the directory could not be loaded) only the IDs are returned.
+    """
+    if directory_index is None:
+        return [{'id': individual_id} for individual_id in individual_ids]
+
+    records = []
+    for individual_id in individual_ids:
+        individual = directory_index.get(individual_id)
+        if individual is not None:
+            records.append(directory_individual_to_dict(individual))
+        else:
+            logger.debug("Individual %s not found in directory", individual_id)
+            records.append({
+                'id': individual_id,
+                'first_name': None,
+                'last_name': None,
+                'preferred_name': None,
+                'is_active': None,
+                'department': None,
+                'manager': None
+            })
+    return records
+
+# Batch Employee Data
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix='upstream')
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def retrieve_many_by_individual(retrieve_many, individual_ids, data_label):
+    """Run one retrieve_many call for a chunk of ids
+
+    Returns {individual_id: (body, error)} so a failure for one id (or the
+    whole chunk) is reported per id instead of failing the batch.
+    """
+    try:
+        page = retrieve_many(
+            requests=[{"individual_id": individual_id} for individual_id in individual_ids]
+        )
+    except APIError as e:
+        error = upstream_error_message(e, data_label)
+        return {individual_id: (None, error) for individual_id in individual_ids}
+    except Exception as e:
+        logger.exception("Unexpected error in %s retrieve_many", data_label.lower())
+        return {individual_id: (None, "Encountered an unexpected error.") for individual_id in individual_ids}
+
+    results = {}
+    for response in page.responses or []:
+        if response.code == 200:
+            results[response.individual_id] = (response.body, None)
+        else:
+            message = getattr(response.body, 'message', None)
+            results[response.individual_id] = (None, message or f"Could not load {data_label.lower()} data.")
+
+    for individual_id in individual_ids:
+        if individual_id not in results:
+            results[individual_id] = (None, f"No {data_label.lower()} data returned")
+    return results
+
+# JSON Serialization
+def parse_fields(fields):
+    """Turn a ?fields= value like 'a,b.c' into a projection tree {'a': {}, 'b': {'c': {}}}
+
+    '*' matches every key of a dict (e.g. 'employees.*.employment.title').
+    Returns None (everything) when no fields are given, raises ValueError for
+    a path with an empty segment (e.g. 'a..b' or 'a.').
+    """
+    tree = {}
+    for path in (fields or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        parts = [part.strip() for part in path.split('.')]
+        if not all(parts):
+            raise ValueError(f'invalid field path {path!r}')
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree or None
+
+def to_json_data(obj, fields=None):
+    """Recursively convert Finch models, and dicts/lists holding them, to JSON-ready data
+
+    Models use pydantic's own dump and keep only the fields the API actually
+    returned. With a projection tree from parse_fields() only those keys are
+    kept; lists are projected item by item, and an empty subtree keeps the
+    whole value.
+    """
+    if isinstance(obj, pydantic.BaseModel):
+        include = None if not fields or '*' in fields else set(fields)
+        data = obj.model_dump(mode='json', by_alias=True, exclude_unset=True, include=include)
+        return project_fields(data, fields) if fields else data
+    if isinstance(obj, dict):
+        if fields:
+            return project_fields(obj, fields)
+        return {key: to_json_data(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_json_data(item, fields) for item in obj]
+    return obj
+
+def project_fields(data, fields):
+    wildcard = fields.get('*')
+    if wildcard is not None:
+        return {key: to_json_data(value, wildcard or None) for key, value in data.items()}
+    return {key: to_json_data(data[key], fields[key] or None) for key in fields if key in data}
+
+def json_data_for_request(obj):
+    """to_json_data() using the current request's ?fields= projection"""
+    return to_json_data(obj, parse_fields(request.args.get('fields')))
+
+class FinchJSONProvider(DefaultJSONProvider):
+    """jsonify() that understands Finch models and encodes with orjson when it is installed"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, pydantic.BaseModel):
+            return to_json_data(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+app.json = FinchJSONProvider(app)
+
+# JSON endpoints the frontend re-fetches, answered with ETags and compression
+CONDITIONAL_JSON_ENDPOINTS = {
+    'list_jobs',
+    'api_deductions',
+    'api_benefit_enrolled_individuals',
+    'api_employee_detail',
+    'api_employee_payments',
+    'api_directory',
+    'api_directory_search'
+}
+
+def negotiate_encoding(accept_encodings):
+    """Pick br or gzip from Accept-Encoding, or None for identity"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+@app.after_request
+def conditional_json_response(response):
+    """Strong ETag, 304 on If-None-Match, then gzip/brotli for repeated JSON reads
+
+    The ETag hashes the uncompressed body and names the encoding, so each
+    representation has its own strong validator.
+    """
+    if (request.endpoint not in CONDITIONAL_JSON_ENDPOINTS or request.method != 'GET'
+            or response.status_code != 200 or not response.is_json or response.direct_passthrough):
+        return response
+
+    data = response.get_data()
+    encoding = negotiate_encoding(request.accept_encodings) if len(data) >= COMPRESS_MIN_SIZE else None
+    etag = generate_etag(data)
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+
+    response.make_conditional(request)
+    if response.status_code == 304 or encoding is None:
+        return response
+
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=4))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Payment History Store
+class PaymentHistoryStore:
+    """Locally stored payment history per connection, in an embedded SQLite database (WAL)
+
+    For each connection we keep the payments seen so far, the date range that
+    has been synced and the latest pay_date (the high-water mark). Requests
+    fetch payments from the high-water mark whenever their window reaches
+    today (at most every PAYMENT_SYNC_INTERVAL seconds), plus any older
+    range that has never been synced, and merge them into the stored history. A database that cannot be read is moved aside
+    and synced again.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._sync_locks = {}
+        self._synced_at = {}
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.DatabaseError as e:
+                conn.close()
+                self._discard_corrupt(e)
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                conn.row_factory = sqlite3.Row
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _discard_corrupt(self, error):
+        """Move an unreadable database aside; payments are fetched again on the next request"""
+        with self._init_lock:
+            if os.path.exists(self.db_path):
+                os.replace(self.db_path, self.db_path + '.corrupt')
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(self.db_path + suffix):
+                    os.remove(self.db_path + suffix)
+        logger.warning("Payment history %s could not be read (%s), starting over", self.db_path, error)
+
+    def _initialize(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS payment_syncs ('
+                    'connection_id TEXT PRIMARY KEY, synced_start TEXT, synced_end TEXT, last_pay_date TEXT)')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS payments ('
+                    'connection_id TEXT NOT NULL, payment_id TEXT NOT NULL, pay_date TEXT, record TEXT NOT NULL, '
+                    'PRIMARY KEY (connection_id, payment_id))')
+                conn.execute('CREATE INDEX IF NOT EXISTS payments_pay_date ON payments (connection_id, pay_date)')
+            self._initialized = True
+
+    def _fetch(self, client, start_date, end_date):
+        payments = client.hris.payments.list(start_date=start_date, end_date=end_date)
+        return [payment_to_history_record(payment) for payment in payments]
+
+    def _connection_lock(self, connection_id):
+        with self._lock:
+            return self._sync_locks.setdefault(connection_id, threading.Lock())
+
+    def get_payments(self, client, connection_id, start_date, end_date):
+        """Return stored payments with start_date <= pay_date <= end_date, syncing first"""
+        if connection_id is None:
+            # Nothing to key the history on, so just fetch the window
+            return [record for record in self._fetch(client, start_date, end_date)
+                    if record['pay_date'] and start_date <= record['pay_date'] <= end_date]
+
+        # Syncs for one connection are serialized; upstream calls run without holding a transaction
+        requested_at = time.monotonic()
+        with self._connection_lock(connection_id):
+            conn = self._connect()
+            row = conn.execute('SELECT * FROM payment_syncs WHERE connection_id = ?', (connection_id,)).fetchone()
+            today = date.today().isoformat()
+            # Never treat future dates as synced, payments can still land there
+            sync_end = min(end_date, today)
+
+            if row is None:
+                started = time.monotonic()
+                self._sync(connection_id, self._fetch(client, start_date, end_date),
+                           synced_start=start_date, synced_end=sync_end)
+                self._synced_at[connection_id] = started
+            else:
+                if start_date < row['synced_start']:
+                    # Backfill the older range that has never been synced
+                    self._sync(connection_id, self._fetch(client, start_date, row['synced_start']),
+                               synced_start=start_date)
+                # A sync that started after this request arrived (while it waited
+                # for the lock), or within the sync interval, already covers today
+                synced_at = self._synced_at.get(connection_id)
+                fresh = synced_at is not None and (
+                    synced_at >= requested_at or time.monotonic() - synced_at < PAYMENT_SYNC_INTERVAL)
+                if end_date > row['synced_end'] or (end_date >= today and not fresh):
+                    # Incremental sync from the high-water mark; payments can land later today.
+                    # A future-dated payment never moves it past the synced range.
+                    since = min(row['last_pay_date'] or row['synced_end'], row['synced_end'])
+                    started = time.monotonic()
+                    self._sync(connection_id, self._fetch(client, since, end_date),
+                               synced_end=max(row['synced_end'], sync_end))
+                    self._synced_at[connection_id] = started
+
+            rows = conn.execute(
+                'SELECT record FROM payments WHERE connection_id = ? AND pay_date BETWEEN ? AND ? ORDER BY pay_date',
+                (connection_id, start_date, end_date))
+            return [json.loads(record) for (record,) in rows]
+
+    def _sync(self, connection_id, records, synced_start=None, synced_end=None):
+        """Merge fetched payments and the newly synced range in one transaction"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO payments VALUES (?, ?, ?, ?)',
+                [(connection_id, record['id'], record['pay_date'], json.dumps(record)) for record in records])
+            row = conn.execute('SELECT last_pay_date FROM payment_syncs WHERE connection_id = ?',
+                               (connection_id,)).fetchone()
+            pay_dates = [record['pay_date'] for record in records if record['pay_date']]
+            if row and row['last_pay_date']:
+                pay_dates.append(row['last_pay_date'])
+            conn.execute(
+                'INSERT INTO payment_syncs VALUES (?, ?, ?, ?) ON CONFLICT (connection_id) DO UPDATE SET '
+                'synced_start = COALESCE(excluded.synced_start, synced_start), '
+                'synced_end = COALESCE(excluded.synced_end, synced_end), '
+                'last_pay_date = excluded.last_pay_date',
+                (connection_id, synced_start, synced_end, max(pay_dates, default=None)))
+
+def payment_to_history_record(payment):
+    """Keep the payment fields the payroll views need"""
+    return {
+        'id': payment.id,
+        'pay_date': payment.pay_date,
+        'pay_period': {
+            'start_date': payment.pay_period.start_date,
+            'end_date': payment.pay_period.end_date
+        } if payment.pay_period else None,
+        'individual_ids': list(payment.individual_ids or [])
+    }
+
+payment_history = PaymentHistoryStore(PAYMENT_HISTORY_DB_PATH)
+
+def parse_date_window(args):
+    """Read start_date/end_date (YYYY-MM-DD) query parameters, defaulting to the last 90 days
+
+    Raises ValueError for malformed or reversed dates.
+    """
+    end_date = args.get('end_date') or date.today().isoformat()
+    start_date = args.get('start_date') or (
+        date.fromisoformat(end_date) - timedelta(days=DEFAULT_PAYMENT_WINDOW_DAYS)).isoformat()
+    start_date = date.fromisoformat(start_date).isoformat()
+    end_date = date.fromisoformat(end_date).isoformat()
+    if start_date > end_date:
+        raise ValueError('start_date must be on or before end_date')
+    return start_date, end_date
+
+# Pay Statement Pipeline
+class PayStatementIndex:
+    """(payment_id, individual_id) -> pay statement for one connection
+
+    Each payment's statements are loaded once and kept for
+    PAY_STATEMENT_CACHE_TTL seconds, so repeat lookups are served from memory.
+    Expired payments are dropped whenever another payment is added.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._individuals = {}
+        self._loaded_at = {}
+
+    def _expire(self, payment_id):
+        for individual_id in self._individuals.pop(payment_id, ()):
+            self._statements.pop((payment_id, individual_id), None)
+        self._loaded_at.pop(payment_id, None)
+
+    def missing(self, payment_ids):
+        """Return the payment ids that are not loaded (or have expired)"""
+        now = time.monotonic()
+        missing = []
+        with self._lock:
+            for payment_id in payment_ids:
+                loaded_at = self._loaded_at.get(payment_id)
+                if loaded_at is not None and now - loaded_at > self.ttl:
+                    self._expire(payment_id)
+                    loaded_at = None
+                if loaded_at is None:
+                    missing.append(payment_id)
+        return missing
+
+    def add(self, payment_id, pay_statements):
+        with self._lock:
+            now = time.monotonic()
+            for expired_id in [pid for pid, loaded_at in self._loaded_at.items() if now - loaded_at > self.ttl]:
+                self._expire(expired_id)
+            self._expire(payment_id)
+            individual_ids = []
+            for pay_statement in pay_statements:
+                self._statements[(payment_id, pay_statement.individual_id)] = pay_statement
+                individual_ids.append(pay_statement.individual_id)
+            self._individuals[payment_id] = individual_ids
+            self._loaded_at[payment_id] = time.monotonic()
+
+    def get(self, payment_id, individual_id):
+        with self._lock:
+            return self._statements.get((payment_id, individual_id))
+
+class PayStatementIndexPool:
+    """Bounded LRU of PayStatementIndex by connection_id"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+
+    def get(self, connection_id):
+        with self._lock:
+            index = self._indexes.get(connection_id)
+            if index is not None:
+                self._indexes.move_to_end(connection_id)
+                return index
+
+            index = PayStatementIndex(self.ttl)
+            self._indexes[connection_id] = index
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+            return index
+
+pay_statement_indexes = PayStatementIndexPool(PAY_STATEMENT_CACHE_CONNECTIONS, PAY_STATEMENT_CACHE_TTL)
+
+def get_pay_statement_index(connection_id):
+    """Get the pay statement index for a connection, creating it on first use"""
+    return pay_statement_indexes.get(connection_id)
+
+def iter_pay_statement_pages(client, payment_ids, page_size=PAY_STATEMENT_PAGE_SIZE):
+    """Page through the pay statements of up to PAY_STATEMENT_CHUNK_SIZE payments
+
+    Every retrieve_many call asks for the next page of each payment still
+    pending. Yields (payment_id, pay_statements, error) per payment and page;
+    a payment that fails yields its error once and is not fetched further.
+    """
+    pending = {payment_id: 0 for payment_id in payment_ids}
+
+    while pending:
+        try:
+            response = client.hris.pay_statements.retrieve_many(
+                requests=[
+                    {"payment_id": payment_id, "offset": offset, "limit": page_size}
+                    for payment_id, offset in pending.items()
+                ]
+            )
+        except Exception as e:
+            for payment_id in pending:
+                yield payment_id, None, f'Error fetching pay statement: {str(e)}'
+            return
+
+        next_pending = {}
+        responded = set()
+        for item in response.responses or []:
+            payment_id = item.payment_id
+            if payment_id not in pending:
+                continue
+            responded.add(payment_id)
+            body = item.body
+            # Batch errors and "sync in progress" bodies have no pay_statements
+            if item.code != 200 or not hasattr(body, 'pay_statements'):
+                message = getattr(body, 'message', None) or f'status {item.code}'
+                yield payment_id, None, f'Error fetching pay statement: {message}'
+                continue
+
+            page_statements = body.pay_statements or []
+            yield payment_id, page_statements, None
+            offset = pending[payment_id] + len(page_statements)
+            count = body.paging.count if body.paging else None
+            if page_statements and count is not None and offset < count:
+                next_pending[payment_id] = offset
+
+        for payment_id in pending:
+            if payment_id not in responded:
+                yield payment_id, None, 'Error fetching pay statement: no response for payment'
+        pending = next_pending
+
+def fetch_pay_statement_chunk(client, payment_ids):
+    """Fetch every pay statement for up to PAY_STATEMENT_CHUNK_SIZE payments
+
+    Follows each payment's paging until all statements are downloaded.
+    Returns ({payment_id: [pay_statement]}, {payment_id: error}).
+    """
+    statements = {payment_id: [] for payment_id in payment_ids}
+    errors = {}
+    for payment_id, page_statements, error in iter_pay_statement_pages(client, payment_ids):
+        if error is not None:
+            errors[payment_id] = error
+        else:
+            statements[payment_id].extend(page_statements)
+
+    return {payment_id: found for payment_id, found in statements.items() if payment_id not in errors}, errors
+
+def load_pay_statements(client, connection_id, payment_ids):
+    """Load pay statements for the given payments into the connection's index
+
+    Payments already in the index are skipped; the rest are fetched in
+    parallel chunks. Returns (index, {payment_id: error}).
+    """
+    index = get_pay_statement_index(connection_id)
+    missing = index.missing(payment_ids)
+
+    futures = [
+        upstream_executor.submit(fetch_pay_statement_chunk, client, chunk)
+        for chunk in chunked(missing, PAY_STATEMENT_CHUNK_SIZE)
+    ]
+    errors = {}
+    for future in futures:
+        statements, chunk_errors = future.result()
+        for payment_id, pay_statements in statements.items():
+            index.add(payment_id, pay_statements)
+        errors.update(chunk_errors)
+    return index, errors
+
+# Bulk Export
+# Dataset -> row model, Finch products it needs, and columns added in front of the model's
+EXPORT_DATASETS = {
+    'directory': (IndividualInDirectory, ('directory',), ()),
+    'individuals': (IndividualResponseBody, ('directory', 'individual'), ('individual_id', 'error')),
+    'employments': (EmploymentDataResponseBody, ('directory', 'employment'), ('individual_id', 'error')),
+    'pay_statements': (PayStatement, PAYROLL_PRODUCTS, ('payment_id', 'pay_date', 'error')),
+}
+
+def model_columns(model, prefix=''):
+    """CSV columns for a Finch model: nested models become dotted columns, lists stay one column"""
+    columns = []
+    for name, field in model.model_fields.items():
+        key = prefix + (field.alias or name)
+        nested = [arg for arg in (field.annotation, *typing.get_args(field.annotation))
+                  if isinstance(arg, type) and issubclass(arg, pydantic.BaseModel)]
+        if nested:
+            columns.extend(model_columns(nested[0], key + '.'))
+        else:
+            columns.append(key)
+    return columns
+
+def flatten_row(data, prefix=''):
+    """Flatten nested dicts to dotted keys; lists are kept as JSON text"""
+    row = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            row.update(flatten_row(value, f"{prefix}{key}."))
+        elif isinstance(value, list):
+            row[prefix + key] = json.dumps(value)
+        else:
+            row[prefix + key] = value
+    return row
+
+def read_ahead(batches, depth=EXPORT_READ_AHEAD):
+    """Iterate `batches` while a background thread fetches up to `depth` more
+
+    Upstream calls overlap with writing the response and memory stays
+    bounded by `depth` batches. Closing the generator (e.g. the client went
+    away) stops the fetching thread after its current batch, and the thread
+    then closes `batches` so calls it queued up are cancelled.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put((batch, None)):
+                    return
+        except Exception as e:
+            put((done, e))
+            return
+        finally:
+            batches.close()
+        put((done, None))
+
+    threading.Thread(target=produce, name='export-read-ahead', daemon=True).start()
+    try:
+        while True:
+            batch, error = buffer.get()
+            if batch is done:
+                if error is not None:
+                    raise error
+                return
+            yield batch
+    finally:
+        stopped.set()
+
+def export_retrieve_many_batches(client, retrieve_many, data_label):
+    """Row batches of one retrieve_many call per RETRIEVE_MANY_CHUNK_SIZE directory entries
+
+    Up to EXPORT_READ_AHEAD retrieve_many calls run on the upstream pool
+    while the directory keeps being paged; batches still come out in order.
+    """
+    def rows_for(individual_ids, future):
+        results = future.result()
+        rows = []
+        for individual_id in individual_ids:
+            body, error = results[individual_id]
+            row = {'individual_id': individual_id, 'error': error}
+            if body is not None:
+                row.update(to_json_data(body))
+            rows.append(row)
+        return rows
+
+    in_flight = []
+    try:
+        for page in iter_directory_pages(client):
+            ids = [individual.id for individual in page.individuals or []]
+            for individual_ids in chunked(ids, RETRIEVE_MANY_CHUNK_SIZE):
+                in_flight.append((individual_ids, upstream_executor.submit(
+                    retrieve_many_by_individual, retrieve_many, individual_ids, data_label)))
+                if len(in_flight) > EXPORT_READ_AHEAD:
+                    yield rows_for(*in_flight.pop(0))
+        while in_flight:
+            yield rows_for(*in_flight.pop(0))
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+def export_pay_statement_batches(client, connection_id, start_date, end_date):
+    """Row batches of every pay statement in the window, one per payment and page of statements"""
+    payments = payment_history.get_payments(client, connection_id, start_date, end_date)
+    for chunk in chunked(payments, PAY_STATEMENT_CHUNK_SIZE):
+        pay_dates = {payment['id']: payment['pay_date'] for payment in chunk}
+        pages = iter_pay_statement_pages(client, list(pay_dates), page_size=EXPORT_PAY_STATEMENT_PAGE_SIZE)
+        for payment_id, pay_statements, error in pages:
+            base = {'payment_id': payment_id, 'pay_date': pay_dates[payment_id]}
+            if error is not None:
+                yield [{**base, 'error': error}]
+            else:
+                yield [{**base, 'error': None, **to_json_data(pay_statement)} for pay_statement in pay_statements]
+
+def export_batches(dataset, client, connection_id, start_date=None, end_date=None):
+    """Generator of row batches (lists of JSON-ready dicts) for an export dataset"""
+    if dataset == 'directory':
+        for page in iter_directory_pages(client):
+            yield [to_json_data(individual) for individual in page.individuals or []]
+    elif dataset == 'individuals':
+        yield from export_retrieve_many_batches(client, client.hris.individuals.retrieve_many, "Individual")
+    elif dataset == 'employments':
+        yield from export_retrieve_many_batches(client, client.hris.employments.retrieve_many, "Employment")
+    elif dataset == 'pay_statements':
+        yield from export_pay_statement_batches(client, connection_id, start_date, end_date)
+
+def write_csv(batches, columns):
+    """CSV text chunks, one per batch, starting with the header
+
+    CSV has no way to report an error in-band, so a failure after the first
+    chunk is raised and the server drops the connection instead of ending
+    the response as if the file were complete.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    try:
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(flatten_row(row) for row in rows)
+            yield buffer.getvalue()
+    except Exception as e:
+        logger.warning("CSV export stopped early: %s", e)
+        raise
+
+def write_ndjson(batches):
+    """NDJSON text chunks, one per batch; a failure ends the stream with an {"error": ...} line"""
+    try:
+        for rows in batches:
+            yield ''.join(app.json.dumps(row) + '\n' for row in rows)
+    except Exception as e:
+        logger.warning("NDJSON export stopped early: %s", e)
+        yield app.json.dumps({'error': upstream_error_message(e, "Export")}) + '\n'
+
+# Job Store
+JOB_FIELDS = ['job_id', 'connection_id', 'provider_id', 'job_type', 'status',
+              'created_at', 'scheduled_at', 'started_at', 'completed_at',
+              'job_url', 'allowed_refreshes', 'remaining_refreshes', 'error_message', 'batch_id']
+# Connections a bulk sync did not create a job for, kept apart from real Finch jobs
+BATCH_RESULT_FIELDS = ['batch_id', 'connection_id', 'provider_id', 'status', 'created_at', 'error_message']
+
+class JobStore:
+    """Job tracking backed by an embedded SQLite database in WAL mode
+
+    Jobs are indexed on job_id and (connection_id, created_at), so status
+    updates are single-row writes. An existing jobs.csv is imported once.
+    Bulk sync outcomes that never became a Finch job live in batch_results.
+    """
+
+    def __init__(self, db_path, csv_path=None):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            columns = ', '.join(
+                f"{field} TEXT PRIMARY KEY" if field == 'job_id' else f"{field} TEXT NOT NULL DEFAULT ''"
+                for field in JOB_FIELDS
+            )
+            with conn:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS jobs ({columns})')
+                # Databases created before a field existed get it added
+                existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+                for field in JOB_FIELDS:
+                    if field not in existing:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {field} TEXT NOT NULL DEFAULT ''")
+                conn.execute('CREATE INDEX IF NOT EXISTS jobs_connection_created ON jobs (connection_id, created_at)')
+                conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+                conn.execute('CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id)')
+                result_columns = ', '.join(f"{field} TEXT NOT NULL DEFAULT ''" for field in BATCH_RESULT_FIELDS)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS batch_results ({result_columns}, '
+                             'PRIMARY KEY (batch_id, connection_id))')
+            self._migrate_csv(conn)
+            self._initialized = True
+
+    def _migrate_csv(self, conn):
+        """Import jobs.csv once, then move it aside so it is not imported again"""
+        if not self.csv_path or not os.path.exists(self.csv_path):
+            return
+        with open(self.csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
+            rows = [self._row_values(row) for row in csv.DictReader(csvfile)]
+        placeholders = ', '.join('?' for _ in JOB_FIELDS)
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({placeholders})", rows)
+        os.replace(self.csv_path, self.csv_path + '.migrated')
+        logger.info("Migrated %d jobs from %s to %s", len(rows), self.csv_path, self.db_path)
+
+    @staticmethod
+    def _row_values(job_data):
+        values = []
+        for field in JOB_FIELDS:
+            value = job_data.get(field)
+            values.append('' if value is None else str(value))
+        return values
+
+    def save(self, job_data):
+        placeholders = ', '.join('?' for _ in JOB_FIELDS)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({placeholders})",
+                self._row_values(job_data))
+
+    def for_connection(self, connection_id):
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT * FROM jobs WHERE connection_id = ? ORDER BY created_at DESC', (connection_id,))
+        return [dict(row) for row in rows]
+
+    def get(self, job_id):
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def for_batch(self, batch_id):
+        conn = self._connect()
+        rows = conn.execute('SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at', (batch_id,))
+        return [dict(row) for row in rows]
+
+    def save_batch_result(self, result):
+        placeholders = ', '.join('?' for _ in BATCH_RESULT_FIELDS)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO batch_results ({', '.join(BATCH_RESULT_FIELDS)}) VALUES ({placeholders})",
+                ['' if result.get(field) is None else str(result[field]) for field in BATCH_RESULT_FIELDS])
+
+    def batch_results(self, batch_id):
+        conn = self._connect()
+        rows = conn.execute('SELECT * FROM batch_results WHERE batch_id = ? ORDER BY created_at', (batch_id,))
+        return [dict(row) for row in rows]
+
+    def with_status(self, statuses):
+        conn = self._connect()
+        placeholders = ', '.join('?' for _ in statuses)
+        rows = conn.execute(f'SELECT * FROM jobs WHERE status IN ({placeholders})', tuple(statuses))
+        return [dict(row) for row in rows]
+
+    def update(self, job_id, status_data):
+        updates = {
+            key: str(value) for key, value in status_data.items()
+            if value is not None and key in JOB_FIELDS and key != 'job_id'
+        }
+        conn = self._connect()
+        with conn:
+            if not updates:
+                row = conn.execute('SELECT 1 FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+                return row is not None
+            assignments = ', '.join(f'{key} = ?' for key in updates)
+            cursor = conn.execute(
+                f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*updates.values(), job_id))
+        return cursor.rowcount > 0
+
+    def delete_created_before(self, cutoff):
+        conn = self._connect()
+        with conn:
+            # Only rows with a parseable timestamp are eligible, jobs with invalid dates are kept
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE created_at GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' "
+                "AND created_at < ?", (cutoff.isoformat(),))
+            conn.execute("DELETE FROM batch_results WHERE created_at < ?", (cutoff.isoformat(),))
+        return cursor.rowcount
+
+job_store = JobStore(JOBS_DB_PATH, csv_path=JOBS_CSV_PATH)
+
+def save_job(job_data):
+    """Save new job to the job store"""
+    job_store.save(job_data)
+
+def get_jobs_for_connection(connection_id):
+    """Get all jobs for a specific connection (newest first)"""
+    return job_store.for_connection(connection_id)
+
+def update_job_status(job_id, status_data):
+    """Update job status in the job store"""
+    return job_store.update(job_id, status_data)
+
+def cleanup_old_jobs(days_to_keep=30):
+    """Remove jobs older than specified days"""
+    cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+    return job_store.delete_created_before(cutoff_date)
+
+
+
+# HRIS Snapshots
+SNAPSHOT_KINDS = ('company', 'directory', 'individual', 'employment', 'benefit', 'enrollment')
+
+# SDK types rebuilt from stored records, so snapshot data reads like a live response
+SNAPSHOT_MODELS = {
+    'company': Company,
+    'directory': IndividualInDirectory,
+    'individual': IndividualResponseBody,
+    'employment': EmploymentDataResponseBody,
+    'benefit': CompanyBenefit
+}
+
+class SnapshotStore:
+    """Per-connection copy of HRIS data in an embedded SQLite database (WAL)
+
+    Each record is stored as JSON under (connection_id, kind, record_id) in
+    the order it was synced. A sync replaces only the kinds it loaded, so a
+    section that failed keeps its previous data.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._sync_locks = {}
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS snapshots ('
+                    'connection_id TEXT PRIMARY KEY, synced_at TEXT NOT NULL, errors TEXT NOT NULL)')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS snapshot_records ('
+                    'connection_id TEXT NOT NULL, kind TEXT NOT NULL, record_id TEXT NOT NULL, '
+                    'position INTEGER NOT NULL, data TEXT NOT NULL, '
+                    'PRIMARY KEY (connection_id, kind, record_id))')
+            self._initialized = True
+
+    def sync_lock(self, connection_id):
+        """Lock held while a connection's snapshot is being synced"""
+        with self._init_lock:
+            return self._sync_locks.setdefault(connection_id, threading.Lock())
+
+    def replace(self, connection_id, records, errors):
+        """Store a sync: records maps kind -> [(record_id, data)], errors maps kind -> message"""
+        conn = self._connect()
+        with conn:
+            for kind, items in records.items():
+                conn.execute('DELETE FROM snapshot_records WHERE connection_id = ? AND kind = ?', (connection_id, kind))
+                conn.executemany(
+                    'INSERT OR REPLACE INTO snapshot_records (connection_id, kind, record_id, position, data) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    ((connection_id, kind, record_id, position, json.dumps(data))
+                     for position, (record_id, data) in enumerate(items)))
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (connection_id, synced_at, errors) VALUES (?, ?, ?)',
+                (connection_id, datetime.now().isoformat(timespec='seconds'), json.dumps(errors)))
+
+    def info(self, connection_id):
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM snapshots WHERE connection_id = ?', (connection_id,)).fetchone()
+        if row is None:
+            return None
+        return {'connection_id': row['connection_id'], 'synced_at': row['synced_at'], 'errors': json.loads(row['errors'])}
+
+    def has(self, connection_id, kind):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT 1 FROM snapshot_records WHERE connection_id = ? AND kind = ? LIMIT 1', (connection_id, kind)).fetchone()
+        return row is not None
+
+    def records(self, connection_id, kind):
+        """Every record of a kind as SDK objects (plain data for enrollments), in sync order"""
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT data FROM snapshot_records WHERE connection_id = ? AND kind = ? ORDER BY position',
+            (connection_id, kind))
+        return [snapshot_record(kind, json.loads(row['data'])) for row in rows]
+
+    def record(self, connection_id, kind, record_id=''):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT data FROM snapshot_records WHERE connection_id = ? AND kind = ? AND record_id = ?',
+            (connection_id, kind, record_id)).fetchone()
+        return snapshot_record(kind, json.loads(row['data'])) if row else None
+
+def snapshot_record(kind, data):
+    model = SNAPSHOT_MODELS.get(kind)
+    return model.construct(**data) if model else data
+
+snapshot_store = SnapshotStore(SNAPSHOT_DB_PATH)
+snapshot_sync_executor = ThreadPoolExecutor(max_workers=SNAPSHOT_SYNC_WORKERS, thread_name_prefix='snapshot-sync')
+
+def sync_snapshot(connection):
+    """Load a connection's company, directory, individuals, employments and benefits into the snapshot store
+
+    Returns the snapshot info. Sections the provider rejects (e.g. unsupported
+    products) are recorded as errors and keep their previous data.
+    """
+    connection_id = connection['connection_id']
+    client = get_finch_client(connection['access_token'])
+    records = {}
+    errors = {}
+
+    def load(kind, loader):
+        try:
+            records[kind] = loader()
+        except Exception as e:
+            errors[kind] = str(e)
+            logger.warning("Snapshot sync of %s for %s failed: %s", kind, connection_id, e)
+
+    with snapshot_store.sync_lock(connection_id):
+        load('company', lambda: [('', to_json_data(client.hris.company.retrieve()))])
+        load('directory', lambda: [
+            (individual.id, to_json_data(individual)) for individual in iter_directory(client)])
+
+        individual_ids = [record_id for record_id, _ in records.get('directory', [])]
+        if individual_ids:
+            load('individual', lambda: snapshot_records_by_individual(
+                client.hris.individuals.retrieve_many, individual_ids, 'Individual'))
+            load('employment', lambda: snapshot_records_by_individual(
+                client.hris.employments.retrieve_many, individual_ids, 'Employment'))
+
+        load('benefit', lambda: [(benefit.benefit_id, to_json_data(benefit)) for benefit in client.hris.benefits.list()])
+        benefit_ids = [record_id for record_id, _ in records.get('benefit', [])]
+        if benefit_ids:
+            load('enrollment', lambda: snapshot_enrollments(client, benefit_ids))
+
+        snapshot_store.replace(connection_id, records, errors)
+    logger.info("Synced snapshot for %s (%s)", connection_id,
+                ', '.join(f"{kind}: {len(items)}" for kind, items in records.items()))
+    return snapshot_store.info(connection_id)
+
+def snapshot_records_by_individual(retrieve_many, individual_ids, data_label):
+    """(individual_id, data) for every individual the provider returned, fetched in concurrent chunks
+
+    Raises RuntimeError when a whole chunk fails (e.g. a 501 or an outage), so
+    the sync records an error and keeps the previous data instead of storing a
+    partial list. Errors for single ids in an otherwise good chunk are skipped.
+    """
+    futures = [
+        snapshot_sync_executor.submit(retrieve_many_by_individual, retrieve_many, chunk, data_label)
+        for chunk in chunked(individual_ids, RETRIEVE_MANY_CHUNK_SIZE)
+    ]
+    records = []
+    for future in futures:
+        results = future.result()
+        if all(body is None for body, _ in results.values()):
+            raise RuntimeError(next(error for _, error in results.values()))
+        for individual_id, (body, error) in results.items():
+            if body is not None:
+                records.append((individual_id, to_json_data(body)))
+    return records
+
+def snapshot_enrollments(client, benefit_ids):
+    """(benefit_id, {'individual_ids': [...]}) for every benefit, fetched concurrently"""
+    futures = {
+        benefit_id: snapshot_sync_executor.submit(client.hris.benefits.individuals.enrolled_ids, benefit_id)
+        for benefit_id in benefit_ids
+    }
+    return [
+        (benefit_id, {'individual_ids': list(future.result().individual_ids or [])})
+        for benefit_id, future in futures.items()
+    ]
+
+def schedule_snapshot_sync(connection_id):
+    """Refresh a connection's snapshot in the background"""
+    def run():
+        connection = connection_registry.get(connection_id)
+        if connection is None:
+            return
+        try:
+            sync_snapshot(connection)
+        except Exception as e:
+            logger.warning("Snapshot sync for %s failed: %s", connection_id, e)
+
+    background_executor.submit(run)
+
+def request_snapshot(connection):
+    """Snapshot info to answer the current request from, or None to fetch live
+
+    ?source=snapshot or ?source=live overrides SERVE_FROM_SNAPSHOT.
+    """
+    source = request.args.get('source')
+    if connection is None or source == 'live':
+        return None
+    if source != 'snapshot' and not SERVE_FROM_SNAPSHOT:
+        return None
+    return snapshot_store.info(connection['connection_id'])
+
+def fallback_snapshot(connection, error):
+    """Snapshot info to serve instead of a live call that failed fast on an open circuit, or None"""
+    if connection is None or not CIRCUIT_SNAPSHOT_FALLBACK or request.args.get('source') == 'live':
+        return None
+    if not is_circuit_open_error(error):
+        return None
+    return snapshot_store.info(connection['connection_id'])
+
+@app.cli.command('sync-snapshot')
+@click.argument('connection_ids', nargs=-1)
+@click.option('--all', 'sync_all', is_flag=True, help='Sync every connection in tokens.csv.')
+def sync_snapshot_command(connection_ids, sync_all):
+    """Fill the local HRIS snapshot (defaults to the active connection)"""
+    if sync_all:
+        targets = [(connection['connection_id'], connection) for connection in get_all_connections()]
+    elif connection_ids:
+        targets = [(connection_id, connection_registry.get(connection_id)) for connection_id in connection_ids]
+    else:
+        targets = [('(active connection)', get_active_connection())]
+
+    for connection_id, connection in targets:
+        if connection is None:
+            click.echo(f"Unknown connection {connection_id}", err=True)
+            continue
+        info = sync_snapshot(connection)
+        click.echo(f"{connection['connection_id']}: synced at {info['synced_at']}"
+                   + (f" with errors in {', '.join(info['errors'])}" if info['errors'] else ''))
+
+
+
+# Background Job Poller
+class JobEventBroker:
+    """Fans job updates out to Server-Sent Events subscribers by connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, connection_id):
+        subscription = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers[subscription] = connection_id
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.pop(subscription, None)
+
+    def publish(self, job):
+        with self._lock:
+            subscribers = [sub for sub, conn_id in self._subscribers.items() if conn_id == job.get('connection_id')]
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(job)
+            except queue.Full:
+                # A stalled browser should not hold up the poller
+                pass
+
+job_events = JobEventBroker()
+
+def job_status_fields(job_status):
+    """Job store fields reported by an automated job status"""
+    return {
+        'status': job_status.status,
+        'started_at': getattr(job_status, 'started_at', ''),
+        'completed_at': getattr(job_status, 'completed_at', ''),
+        'scheduled_at': getattr(job_status, 'scheduled_at', '')
+    }
+
+def record_job_status(job_id, job_status):
+    """Persist a job status if it changed and notify stream subscribers
+
+    Returns True if anything changed.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return False
+    changes = {
+        key: value for key, value in job_status_fields(job_status).items()
+        if value is not None and str(value) != job.get(key, '')
+    }
+    if not changes:
+        return False
+    update_job_status(job_id, changes)
+    job_events.publish(job_store.get(job_id))
+    # A finished data sync means fresher provider data, so refresh the local snapshot
+    if changes.get('status') == 'complete' and job.get('job_type') == 'data_sync_all':
+        schedule_snapshot_sync(job['connection_id'])
     return True
 
-def get_connection_details(access_token):
-    """Get provider and company details for a connection"""
-    try:
-        client = Finch(access_token=access_token)
-        company_data = client.hris.company.retrieve()
-        return {
-            'company_name': company_data.legal_name or 'Unknown Company',
-            'status': 'Active'
-        }
-    except Exception as e:
+class JobPoller:
+    """Single background thread that polls Finch for unfinished jobs
+
+    Every pending/in_progress job in the job store is polled on its own
+    schedule. The interval starts at JOB_POLL_MIN_INTERVAL and doubles (up to
+    JOB_POLL_MAX_INTERVAL) while the status is unchanged or the call fails,
+    so upstream traffic depends on active jobs, not on open browser tabs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._schedule = {}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='job-poller', daemon=True)
+            self._thread.start()
+
+    def track(self, job_id):
+        """Poll a job as soon as possible (e.g. right after it is enqueued)"""
+        with self._lock:
+            self._schedule[job_id] = (0, JOB_POLL_MIN_INTERVAL)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            # Clear before polling so a track() that lands mid-poll still wakes the next wait
+            self._wake.clear()
+            try:
+                delay = self._poll_due_jobs()
+            except Exception as e:
+                logger.exception("Job poller error")
+                delay = JOB_POLL_MAX_INTERVAL
+            self._wake.wait(timeout=delay)
+
+    def _poll_due_jobs(self):
+        active_jobs = {job['job_id']: job for job in job_store.with_status(JOB_ACTIVE_STATUSES)}
+        now = time.monotonic()
+
+        with self._lock:
+            for job_id in list(self._schedule):
+                if job_id not in active_jobs:
+                    del self._schedule[job_id]
+            for job_id in active_jobs:
+                self._schedule.setdefault(job_id, (now, JOB_POLL_MIN_INTERVAL))
+            due = [job_id for job_id, (next_poll, _) in self._schedule.items() if next_poll <= now]
+
+        for job_id in due:
+            self._poll(active_jobs[job_id])
+
+        with self._lock:
+            if not self._schedule:
+                return JOB_POLL_MAX_INTERVAL
+            next_poll = min(next_poll for next_poll, _ in self._schedule.values())
+        return max(0, next_poll - time.monotonic())
+
+    def _poll(self, job):
+        job_id = job['job_id']
+        with self._lock:
+            _, interval = self._schedule.get(job_id, (0, JOB_POLL_MIN_INTERVAL))
+
+        changed = False
+        connection = connection_registry.get(job['connection_id'])
+        if connection is not None:
+            try:
+                job_status = get_finch_client(connection['access_token']).jobs.automated.retrieve(job_id)
+                changed = record_job_status(job_id, job_status)
+            except Exception as e:
+                logger.warning("Job poller could not refresh %s: %s", job_id, e)
+
+        interval = JOB_POLL_MIN_INTERVAL if changed else min(interval * 2, JOB_POLL_MAX_INTERVAL)
+        with self._lock:
+            if job_id in self._schedule:
+                self._schedule[job_id] = (time.monotonic() + interval, interval)
+
+job_poller = JobPoller()
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# Bulk Sync
+def create_sync_job(connection, batch_id=''):
+    """Create a data_sync_all job for a connection, store it and start polling it"""
+    client = get_finch_client(connection['access_token'])
+    job_response = client.jobs.automated.create(type="data_sync_all")
+    logger.info("Created data_sync_all job %s for connection %s", job_response.job_id, connection['connection_id'])
+    logger.debug("Job create response: %s", job_response)
+
+    job_data = {
+        'job_id': job_response.job_id,
+        'connection_id': connection['connection_id'],
+        'provider_id': connection['provider_id'],
+        'job_type': 'data_sync_all',
+        'status': 'pending',
+        'created_at': datetime.now().isoformat(),
+        'scheduled_at': getattr(job_response, 'scheduled_at', ''),
+        'started_at': '',
+        'completed_at': '',
+        'job_url': job_response.job_url,
+        'allowed_refreshes': job_response.allowed_refreshes,
+        'remaining_refreshes': job_response.remaining_refreshes,
+        'error_message': '',
+        'batch_id': batch_id
+    }
+    save_job(job_data)
+
+    # Hand the job to the background poller and tell any open streams
+    job_events.publish(job_store.get(job_response.job_id))
+    job_poller.track(job_response.job_id)
+    return job_data
+
+def sync_skip_reason(connection):
+    """Why a connection should not get a new data sync now, or None
+
+    A sync already in flight, or a refresh allowance used up earlier today
+    (as reported by the last job Finch created), both rule it out.
+    """
+    jobs = [job for job in get_jobs_for_connection(connection['connection_id']) if job['job_type'] == 'data_sync_all']
+    if any(job['status'] in JOB_ACTIVE_STATUSES for job in jobs):
+        return "A data sync is already running"
+    created = [job for job in jobs if job['remaining_refreshes'] != '']
+    if created:
+        latest = created[0]
+        if latest['remaining_refreshes'] == '0' and latest['created_at'][:10] == date.today().isoformat():
+            return f"No refreshes remaining today ({latest['allowed_refreshes'] or '?'} allowed)"
+    return None
+
+class BulkSync:
+    """One data_sync_all run across many connections
+
+    Starts are spread evenly over `window` seconds, interleaving providers so
+    each provider's jobs are spaced out, and at most `per_provider` job
+    creations run against a provider at once. Every connection gets a row in
+    the job store under the run's batch_id: the created job, or a 'skipped'
+    or 'failed' batch result explaining why there is none.
+    """
+
+    def __init__(self, connections, window=BULK_SYNC_WINDOW, per_provider=BULK_SYNC_PROVIDER_CONCURRENCY):
+        self.batch_id = f"bulk-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.window = max(0.0, window)
+        self.per_provider = max(1, per_provider)
+        self.plan = self._plan(connections)
+        self.finished_at = None
+
+    def _plan(self, connections):
+        by_provider = OrderedDict()
+        skipped = []
+        for connection in connections:
+            reason = sync_skip_reason(connection)
+            if reason:
+                skipped.append({'connection': connection, 'skip_reason': reason, 'start_after': None})
+            else:
+                by_provider.setdefault(connection['provider_id'], []).append(connection)
+
+        # Round-robin over providers, then give each start an even share of the window
+        ordered = [connection for group in itertools.zip_longest(*by_provider.values())
+                   for connection in group if connection is not None]
+        spacing = self.window / len(ordered) if ordered else 0
+        scheduled = [{'connection': connection, 'skip_reason': None, 'start_after': round(i * spacing, 3)}
+                     for i, connection in enumerate(ordered)]
+        return scheduled + skipped
+
+    def summary(self):
         return {
-            'company_name': 'Unknown Company',
-            'status': 'Error'
+            'batch_id': self.batch_id,
+            'window_seconds': self.window,
+            'per_provider_concurrency': self.per_provider,
+            'connections': [{
+                'connection_id': entry['connection']['connection_id'],
+                'provider_id': entry['connection']['provider_id'],
+                'start_after': entry['start_after'],
+                'skip_reason': entry['skip_reason']
+            } for entry in self.plan]
         }
 
-# Jobs CSV Management Functions
-def get_jobs_csv_headers():
-    """Get the headers for the jobs CSV file"""
-    return ['job_id', 'connection_id', 'provider_id', 'job_type', 'status', 
-            'created_at', 'scheduled_at', 'started_at', 'completed_at', 
-            'job_url', 'allowed_refreshes', 'remaining_refreshes', 'error_message']
-
-def save_job_to_csv(job_data):
-    """Save new job to CSV"""
-    headers = get_jobs_csv_headers()
-    file_exists = os.path.exists(JOBS_CSV_PATH)
-    
-    # Ensure all required fields are present
-    row_data = {}
-    for header in headers:
-        row_data[header] = job_data.get(header, '')
-    
-    with open(JOBS_CSV_PATH, mode='a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row_data)
+    def _record(self, connection, status, message):
+        job_store.save_batch_result({
+            'batch_id': self.batch_id,
+            'connection_id': connection['connection_id'],
+            'provider_id': connection['provider_id'],
+            'status': status,
+            'created_at': datetime.now().isoformat(),
+            'error_message': message
+        })
 
-def get_jobs_for_connection(connection_id):
-    """Get all jobs for a specific connection"""
-    if not os.path.exists(JOBS_CSV_PATH):
-        return []
-    
-    jobs = []
-    with open(JOBS_CSV_PATH, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row['connection_id'] == connection_id:
-                jobs.append(row)
-    
-    # Sort by created_at (newest first)
-    jobs.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return jobs
+    def run(self, on_result=None):
+        """Create the jobs (blocking until the last start); returns the batch's jobs and batch results"""
+        try:
+            return self._run(on_result)
+        finally:
+            self.finished_at = time.monotonic()
 
-def update_job_status(job_id, status_data):
-    """Update job status in CSV"""
-    if not os.path.exists(JOBS_CSV_PATH):
-        return False
-    
-    jobs = []
-    updated = False
-    
-    # Read all jobs
-    with open(JOBS_CSV_PATH, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row['job_id'] == job_id:
-                # Update this job with new status data
-                for key, value in status_data.items():
-                    if value is not None:
-                        row[key] = value
-                updated = True
-            jobs.append(row)
-    
-    if updated:
-        # Write back all jobs
-        headers = get_jobs_csv_headers()
-        with open(JOBS_CSV_PATH, mode='w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(jobs)
-    
-    return updated
+    def _run(self, on_result):
+        for entry in self.plan:
+            if entry['skip_reason']:
+                self._record(entry['connection'], 'skipped', entry['skip_reason'])
 
-def cleanup_old_jobs(days_to_keep=30):
-    """Remove jobs older than specified days"""
-    if not os.path.exists(JOBS_CSV_PATH):
-        return 0
-    
-    cutoff_date = datetime.now() - timedelta(days=days_to_keep)
-    jobs_to_keep = []
-    removed_count = 0
-    
-    with open(JOBS_CSV_PATH, mode='r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            try:
-                created_at = datetime.fromisoformat(row['created_at'].replace('Z', '+00:00'))
-                if created_at >= cutoff_date:
-                    jobs_to_keep.append(row)
-                else:
-                    removed_count += 1
-            except (ValueError, KeyError):
-                # Keep jobs with invalid dates
-                jobs_to_keep.append(row)
-    
-    if removed_count > 0:
-        # Write back remaining jobs
-        headers = get_jobs_csv_headers()
-        with open(JOBS_CSV_PATH, mode='w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(jobs_to_keep)
-    
-    return removed_count
+        scheduled = [entry for entry in self.plan if entry['start_after'] is not None]
+        providers = {entry['connection']['provider_id'] for entry in scheduled}
+        limits = {provider: threading.Semaphore(self.per_provider) for provider in providers}
+        started = time.monotonic()
+
+        def start(entry):
+            connection = entry['connection']
+            time.sleep(max(0, started + entry['start_after'] - time.monotonic()))
+            with limits[connection['provider_id']]:
+                try:
+                    job = create_sync_job(connection, batch_id=self.batch_id)
+                except APIError as e:
+                    status_code = getattr(e, 'status_code', None)
+                    if status_code == 501:
+                        message = "Automated jobs unsupported for this provider"
+                    elif is_circuit_open_error(e):
+                        message = "The provider is not responding, skipped while its circuit is open"
+                    elif status_code == 429:
+                        message = "Rate limited or out of refreshes"
+                    else:
+                        message = f"Finch API Error: {e}"
+                    logger.warning("Bulk sync %s: %s failed: %s", self.batch_id, connection['connection_id'], message)
+                    self._record(connection, 'failed', message)
+                    job = None
+                except Exception as e:
+                    logger.exception("Bulk sync %s: %s failed", self.batch_id, connection['connection_id'])
+                    self._record(connection, 'failed', f"Unexpected error: {e}")
+                    job = None
+            if on_result:
+                on_result(connection, job)
+
+        if scheduled:
+            workers = min(len(scheduled), self.per_provider * len(providers))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-sync') as pool:
+                # Submitted in start order, so a worker is free by the time each start is due
+                for future in [pool.submit(start, entry) for entry in scheduled]:
+                    future.result()
+        logger.info("Bulk sync %s finished: %d scheduled, %d skipped",
+                    self.batch_id, len(scheduled), len(self.plan) - len(scheduled))
+        return job_store.for_batch(self.batch_id) + job_store.batch_results(self.batch_id)
+
+# Runs started from the API in this process, by batch_id, until BULK_SYNC_RETENTION after they finish
+bulk_syncs = {}
+bulk_syncs_lock = threading.Lock()
+
+def track_bulk_sync(bulk_sync):
+    """Remember a bulk sync started here, forgetting finished ones past their retention"""
+    now = time.monotonic()
+    with bulk_syncs_lock:
+        for batch_id, tracked in list(bulk_syncs.items()):
+            if tracked.finished_at is not None and now - tracked.finished_at > BULK_SYNC_RETENTION:
+                del bulk_syncs[batch_id]
+        bulk_syncs[bulk_sync.batch_id] = bulk_sync
+
+def bulk_sync_targets(connection_ids=None):
+    """Connections from tokens.csv to sync (all of them by default), and any unknown IDs"""
+    if not connection_ids:
+        return get_all_connections(), []
+    connections, unknown = [], []
+    for connection_id in connection_ids:
+        connection = connection_registry.get(connection_id)
+        if connection is None:
+            unknown.append(connection_id)
+        else:
+            connections.append(connection)
+    return connections, unknown
 
+@app.cli.command('bulk-sync')
+@click.argument('connection_ids', nargs=-1)
+@click.option('--window', type=float, default=BULK_SYNC_WINDOW, show_default=True,
+              help='Seconds to spread the job starts over.')
+@click.option('--per-provider', type=int, default=BULK_SYNC_PROVIDER_CONCURRENCY, show_default=True,
+              help='Job creations in flight per provider.')
+@click.option('--dry-run', is_flag=True, help='Print the schedule without creating jobs.')
+def bulk_sync_command(connection_ids, window, per_provider, dry_run):
+    """Create data_sync_all jobs for every connection in tokens.csv (or the given IDs)"""
+    connections, unknown = bulk_sync_targets(connection_ids)
+    for connection_id in unknown:
+        click.echo(f"Unknown connection {connection_id}", err=True)
 
+    bulk_sync = BulkSync(connections, window=window, per_provider=per_provider)
+    summary = bulk_sync.summary()
+    click.echo(f"Batch {bulk_sync.batch_id}: {len(connections)} connections over {bulk_sync.window:g}s")
+    if dry_run:
+        for entry in summary['connections']:
+            when = f"+{entry['start_after']:g}s" if entry['skip_reason'] is None else f"skip: {entry['skip_reason']}"
+            click.echo(f"  {entry['connection_id']} ({entry['provider_id']}) {when}")
+        return
+
+    def report(connection, job):
+        outcome = f"job {job['job_id']}" if job else "failed"
+        click.echo(f"  {connection['connection_id']} ({connection['provider_id']}): {outcome}")
+
+    rows = bulk_sync.run(on_result=report)
+    counts = {}
+    for row in rows:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+    click.echo(', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+
+
+@app.before_request
+def start_background_workers():
+    job_poller.start()
 
 @app.route('/')
 def home():
@@ -198,13 +2810,12 @@ def home():
     
     # Get details for each connection
     connection_details = []
-    for conn in connections:
-        details = get_connection_details(conn['access_token'])
-        
+    all_details = get_all_connection_details(connections)
+    for conn, details in zip(connections, all_details):
         # Check if connection has payroll and benefits scopes
-        products = conn.get('products', '').split('|') if conn.get('products') else []
-        has_payroll = 'payment' in products and 'pay_statement' in products
-        has_benefits = 'benefits' in products
+        products = [product for product in conn.get('products', '').split('|') if product]
+        has_payroll = bool(products) and not missing_products(conn, PAYROLL_PRODUCTS)
+        has_benefits = bool(products) and not missing_products(conn, BENEFITS_PRODUCTS)
         
         connection_details.append({
             'connection_id': conn['connection_id'],
@@ -241,10 +2852,7 @@ def connect():
     else:
         sandbox_selection = ""  # Default (production)
     
-    client = Finch(
-        client_id= CLIENT_ID,
-        client_secret= CLIENT_SECRET
-    )
+    client = finch_clients.oauth_client()
 
     response = client.connect.sessions.new(
         customer_id = str(uuid.uuid4()),
@@ -261,11 +2869,10 @@ def reauth(connection_id):
     """Reauthenticate a connection with additional payroll and benefits scopes"""
     # Include all scopes for accessing payment, pay statement, and benefits data
     scopes = ["company", "directory", "individual", "employment", "payment", "pay_statement", "benefits"]
+    company_cache.invalidate(connection_id)
+    directory_index_cache.invalidate(connection_id)
     
-    client = Finch(
-        client_id= CLIENT_ID,
-        client_secret= CLIENT_SECRET
-    )
+    client = finch_clients.oauth_client()
 
     try:
         response = client.connect.sessions.reauthenticate(
@@ -275,26 +2882,27 @@ def reauth(connection_id):
         )
         return redirect(response.connect_url)
     except Exception as e:
-        print(f"Reauth error: {e}")
+        logger.warning("Reauth error: %s", e)
         return redirect('/')
 
 @app.route('/introspect')
 def introspect():
     """Debug endpoint to see current connection details and scopes"""
-    client = Finch(
-        access_token=get_latest_access_token(),
-    )
+    client = get_finch_client()
     
     try:
         introspection = client.account.introspect()
-        print("\n" + "="*80)
-        print("CONNECTION INTROSPECTION")
-        print("="*80)
-        print(f"Connection ID: {introspection.connection_id}")
-        print(f"Provider ID: {introspection.provider_id}")
-        print(f"Current Products: {introspection.products}")
-        print(f"Connection Status: {introspection.connection_status.status if introspection.connection_status else 'Unknown'}")
-        print(f"Full Introspection: {introspection}")
+        logger.info("Connection introspection: connection_id=%s provider_id=%s products=%s status=%s",
+                    introspection.connection_id,
+                    introspection.provider_id,
+                    introspection.products,
+                    introspection.connection_status.status if introspection.connection_status else 'Unknown')
+        logger.debug("Full introspection: %s", introspection)
+
+        # Refresh the stored products the scope checks are made from
+        active_conn = get_active_connection()
+        if active_conn and introspection.products is not None:
+            connection_registry.update_products(active_conn['connection_id'], introspection.products)
         
         return jsonify({
             'connection_id': introspection.connection_id,
@@ -305,95 +2913,55 @@ def introspect():
         })
     except Exception as e:
         error_msg = f"Error introspecting connection: {e}"
-        print(f"INTROSPECT ERROR: {error_msg}")
+        logger.error("Introspect error: %s", error_msg)
         return jsonify({'error': error_msg}), 500
 
 @app.route('/authorize')
 def authorize():
     auth_code = request.args.get('code')
     
-    client = Finch(
-        client_id= CLIENT_ID,
-        client_secret= CLIENT_SECRET
-    )
+    client = finch_clients.oauth_client()
     create_access_token_response = client.access_tokens.create(
         code=auth_code,
         redirect_uri=REDIRECT_URI
     )
 
     # Storing locally in a csv for demo purposes
-    header = ['access_token', 'token_type', 'connection_id', 'customer_id',
-              'account_id', 'client_type', 'company_id', 'connection_type',
-              'products', 'provider_id', 'active']
-
-    products_str = "|".join(create_access_token_response.products)
     connection_id = create_access_token_response.connection_id
+    existing_connection = connection_registry.get(connection_id)
+    existed = existing_connection is not None
 
-    # Check if this connection already exists (reauthentication case)
-    file_exists = os.path.exists(CSV_FILE_PATH)
-    connections = get_all_connections() if file_exists else []
-    
-    existing_connection_index = None
-    for i, conn in enumerate(connections):
-        if conn['connection_id'] == connection_id:
-            existing_connection_index = i
-            break
-    
-    if existing_connection_index is not None:
-        # Update existing connection with new token and products
-        print(f"Updating existing connection: {connection_id}")
-        connections[existing_connection_index].update({
+    if existed:
+        # The old token is being replaced, drop its pooled client
+        finch_clients.evict(existing_connection['access_token'])
+        async_upstream.evict(existing_connection['access_token'])
+        # Reauthentication case - update existing connection with new token and products
+        logger.info("Updating existing connection: %s", connection_id)
+        connection = {
+            'connection_id': connection_id,
             'access_token': create_access_token_response.access_token,
             'token_type': create_access_token_response.token_type,
-            'products': products_str,
-            'active': 'True'
-        })
-        
-        # Deactivate other connections
-        for i, conn in enumerate(connections):
-            if i != existing_connection_index:
-                conn['active'] = 'False'
-        
-        # Write back all connections
-        with open(CSV_FILE_PATH, mode='w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(connections)
+            'products': "|".join(create_access_token_response.products),
+        }
     else:
-        # New connection - add it
-        print(f"Adding new connection: {connection_id}")
-        
-        # Deactivate existing connections
-        for conn in connections:
-            conn['active'] = 'False'
-        
-        # Write back existing connections first
-        if connections:
-            with open(CSV_FILE_PATH, mode='w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=header)
-                writer.writeheader()
-                writer.writerows(connections)
+        logger.info("Adding new connection: %s", connection_id)
+        connection = {
+            'access_token': create_access_token_response.access_token,
+            'token_type': create_access_token_response.token_type,
+            'connection_id': connection_id,
+            'customer_id': create_access_token_response.customer_id,
+            'account_id': create_access_token_response.account_id,
+            'client_type': create_access_token_response.client_type,
+            'company_id': create_access_token_response.company_id,
+            'connection_type': create_access_token_response.connection_type,
+            'products': "|".join(create_access_token_response.products),
+            'provider_id': create_access_token_response.provider_id,
+        }
 
-        # Add new connection
-        row_data = [
-            create_access_token_response.access_token,
-            create_access_token_response.token_type,
-            create_access_token_response.connection_id,
-            create_access_token_response.customer_id,
-            create_access_token_response.account_id,
-            create_access_token_response.client_type,
-            create_access_token_response.company_id,
-            create_access_token_response.connection_type,
-            products_str,
-            create_access_token_response.provider_id,
-            'True'  # New connection is active
-        ]
-        
-        with open(CSV_FILE_PATH, mode='a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            if not file_exists:
-                writer.writerow(header)
-            writer.writerow(row_data)
+    # Writes memory and disk together and makes this the active connection
+    connection_registry.upsert(connection)
+    company_cache.invalidate(connection_id)
+    directory_index_cache.invalidate(connection_id)
 
     # Redirect to directory route
     return redirect('/directory')
@@ -401,123 +2969,229 @@ def authorize():
 @app.route('/company')
 def company():
 
-    client = Finch(
-        access_token=get_latest_access_token(),
-    )
-
     # Get compnay data, handles compatibility issues with custom message
     company_data = None 
     error_message = None
     try:
-        company_data = client.hris.company.retrieve()
+        company_data = get_company_data()
     except APIError as e:
         if hasattr(e, 'status_code') and e.status_code == 501:
             error_message = "Company data unsupported for provider"
-            print(f"{e}")
+            logger.warning("%s (%s)", error_message, e)
         else:
             error_message = "Could not load company data."
-            print(f"{e}")
+            logger.warning("%s (%s)", error_message, e)
     except Exception as e:
         error_message = "Encountered an unexpected error."
-        print(f"{e}")
+        logger.warning("%s (%s)", error_message, e)
 
     return render_template('company.html', company_data=company_data, error_message=error_message)
 
 @app.route('/directory')
-def directory():
+async def directory():
+    # Registry and snapshot reads touch the disk, so they run off the shared event loop
+    connection = await asyncio.to_thread(get_active_connection)
+    access_token = connection['access_token'] if connection else None
+    client = async_upstream.client(access_token)
 
-    client = Finch(
-        access_token=get_latest_access_token(),
-    )
+    # Whatever the snapshot holds is served from it, the rest is fetched live
+    snapshot = await asyncio.to_thread(request_snapshot, connection)
+    snapshot_individuals = snapshot_company = None
+    if snapshot:
+        snapshot_individuals = await asyncio.to_thread(snapshot_store.records, snapshot['connection_id'], 'directory')
+        snapshot_company = await asyncio.to_thread(snapshot_store.record, snapshot['connection_id'], 'company')
+
+    # A cached directory index answers without any directory calls
+    cached_index = None
+    if connection and not snapshot_individuals:
+        cached_index = directory_index_cache.peek(
+            connection['connection_id'], lambda: DirectoryIndex(iter_directory(get_finch_client(access_token))))
+    if cached_index is not None:
+        snapshot_individuals = cached_index.individuals
+
+    # The first directory page and the company card are independent, so fetch them together
+    fetch = ParallelFetch()
+    if not snapshot_individuals:
+        fetch.add('directory', lambda: coalesced_async(
+            connection, 'hris.directory.list',
+            lambda: client.hris.directory.list(offset=0, limit=DIRECTORY_PAGE_SIZE), 0, DIRECTORY_PAGE_SIZE))
+    if snapshot_company is None:
+        fetch.add('company', lambda: get_company_data_async(connection))
+    results = await fetch.run()
 
     # Get individual data, handles compatibility issues with custom message
     individuals = []
+    directory_total = 0
     directory_error = None
-    try:
-        individuals = client.hris.directory.list().individuals
-    except APIError as e:
-        if hasattr(e, 'status_code') and e.status_code == 501:
-            directory_error = "Directory data unsupported for provider"
-            print(f"{e}")
+    if snapshot_individuals:
+        individuals = snapshot_individuals
+        directory_total = len(snapshot_individuals)
+    else:
+        first_page, error = results['directory']
+        fallback = await asyncio.to_thread(fallback_snapshot, connection, error) if error is not None else None
+        fallback_individuals = None
+        if fallback:
+            fallback_individuals = await asyncio.to_thread(snapshot_store.records, fallback['connection_id'], 'directory')
+        if fallback_individuals:
+            # The provider's circuit is open, so show the last snapshot rather than an error
+            individuals = fallback_individuals
+            directory_total = len(fallback_individuals)
+            snapshot = fallback
+        elif error is not None:
+            directory_error = upstream_error_message(error, "Directory")
         else:
-            directory_error = "Could not load directory data."
-            print(f"{e}")
-    except Exception as e:
-        directory_error = "Encountered an unexpected error."
-        print(f"{e}")
+            # Later pages are fetched while the rows stream out, and a complete
+            # walk is kept as the directory index for the next request
+            on_complete = None
+            if connection:
+                connection_id = connection['connection_id']
+                generation = directory_index_cache.generation(connection_id)
+                on_complete = lambda seen: directory_index_cache.put(connection_id, DirectoryIndex(seen), generation)
+            individuals = DirectoryStream(get_finch_client(access_token), first_page=first_page,
+                                          on_complete=on_complete)
+            directory_total = individuals.total
 
     # Get company data for the top card
-    company_data = None 
     company_error = None
-    try:
-        company_data = client.hris.company.retrieve()
-    except APIError as e:
-        if hasattr(e, 'status_code') and e.status_code == 501:
-            company_error = "Company data unsupported for provider"
-            print(f"{e}")
-        else:
-            company_error = "Could not load company data."
-            print(f"{e}")
-    except Exception as e:
-        company_error = "Encountered an unexpected error."
-        print(f"{e}")
+    if snapshot_company is not None:
+        company_data = snapshot_company
+    else:
+        company_data, error = results['company']
+        fallback = await asyncio.to_thread(fallback_snapshot, connection, error) if error is not None else None
+        if fallback:
+            company_data = await asyncio.to_thread(snapshot_store.record, fallback['connection_id'], 'company')
+        if company_data is None and error is not None:
+            company_error = upstream_error_message(error, "Company")
 
-    return render_template('directory.html', 
-                         directory_data=individuals, 
+    # Rows are streamed out as directory pages arrive
+    return app.response_class(stream_template('directory.html',
+                         directory_data=individuals,
+                         directory_total=directory_total,
                          directory_error=directory_error,
                          company_data=company_data,
-                         company_error=company_error)
+                         company_error=company_error,
+                         snapshot_synced_at=snapshot['synced_at'] if snapshot else None))
 
 
-def get_employee_data(employee_id):
-    """Shared function to get employee data for both API and template routes"""
-    client = Finch(
-        access_token=get_latest_access_token(),
-    )
-
-    employment_data = None
-    employment_error = None 
+@app.route('/api/directory')
+@accepts_fields
+def api_directory():
+    """API endpoint that returns one page of the directory as JSON"""
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DIRECTORY_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    if offset < 0 or limit < 1 or limit > DIRECTORY_MAX_PAGE_SIZE:
+        return jsonify({'error': f'offset must be >= 0 and limit between 1 and {DIRECTORY_MAX_PAGE_SIZE}'}), 400
 
-    # Get employment data, handles compatibility issues with custom message
     try:
-        page = client.hris.employments.retrieve_many(
-            requests=[{
-                    "individual_id" : employee_id
-                }
-            ]
-        )
-        employment_data = page.responses[0].body
+        client = get_finch_client()
+        page = coalesced(get_active_connection(), 'hris.directory.list',
+                         lambda: client.hris.directory.list(offset=offset, limit=limit), offset, limit)
+        individuals = page.individuals or []
+        count = page.paging.count if page.paging else None
+        next_offset = offset + len(individuals)
+        has_more = bool(individuals) and (next_offset < count if count is not None else len(individuals) == limit)
+
+        return jsonify(json_data_for_request({
+            'individuals': [directory_individual_to_dict(individual) for individual in individuals],
+            'paging': {
+                'offset': offset,
+                'limit': limit,
+                'count': count
+            },
+            'next_offset': next_offset if has_more else None
+        }))
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
+        error_msg = f"API Error: {e}"
         if hasattr(e, 'status_code') and e.status_code == 501:
-            employment_error = "Employment data unsupported for provider"
-            print(f"{e}")
-        else:
-            employment_error = "Could not load employment data."
-            print(f"{e}")
+            error_msg = "Directory data unsupported for this provider"
+        return jsonify({'error': error_msg}), 400
     except Exception as e:
-        employment_error = "Encountered an unexpected error."
-        print(f"{e}")
+        error_msg = f"Unexpected error: {e}"
+        return jsonify({'error': error_msg}), 500
 
-    # Get individual data, handles compatibility issues with custom message
-    individual_data = None
-    individual_error = None
+
+@app.route('/api/directory/search')
+@accepts_fields
+def api_directory_search():
+    """Filter the cached directory index by name/id text, department, manager and status"""
     try:
-        page = client.hris.individuals.retrieve_many(
-            requests=[{
-                "individual_id" : employee_id
-            }]
-        )
-        individual_data = page.responses[0].body
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DIRECTORY_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    if offset < 0 or limit < 1 or limit > DIRECTORY_MAX_PAGE_SIZE:
+        return jsonify({'error': f'offset must be >= 0 and limit between 1 and {DIRECTORY_MAX_PAGE_SIZE}'}), 400
+
+    is_active = request.args.get('is_active')
+    if is_active not in (None, 'true', 'false'):
+        return jsonify({'error': 'is_active must be true or false'}), 400
+
+    try:
+        matches = get_directory_index().search(
+            query=request.args.get('q'),
+            department=request.args.get('department'),
+            manager_id=request.args.get('manager_id'),
+            is_active=None if is_active is None else is_active == 'true')
+        individuals = matches[offset:offset + limit]
+        next_offset = offset + len(individuals)
+
+        return jsonify(json_data_for_request({
+            'individuals': [directory_individual_to_dict(individual) for individual in individuals],
+            'paging': {
+                'offset': offset,
+                'limit': limit,
+                'count': len(matches)
+            },
+            'next_offset': next_offset if next_offset < len(matches) else None
+        }))
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
+        error_msg = f"API Error: {e}"
         if hasattr(e, 'status_code') and e.status_code == 501:
-            individual_error = "Individual data unsupported for provider"
-            print(f"{e}")
-        else:
-            individual_error = "Could not load individual data."
-            print(f"{e}")
+            error_msg = "Directory data unsupported for this provider"
+        return jsonify({'error': error_msg}), 400
     except Exception as e:
-        individual_error = "Encountered an unexpected error."
-        print(f"{e}")
+        error_msg = f"Unexpected error: {e}"
+        return jsonify({'error': error_msg}), 500
+
+
+async def first_response_body(retrieve_many):
+    """Body of the first item of an awaited retrieve_many call"""
+    page = await retrieve_many
+    return page.responses[0].body
+
+async def get_employee_data(employee_id, access_token=None):
+    """Shared function to get employee data for both API and template routes
+
+    Employment and individual data are requested at the same time.
+    """
+    if access_token is None:
+        access_token = await asyncio.to_thread(get_latest_access_token)
+    client = async_upstream.client(access_token)
+    request_body = [{"individual_id": employee_id}]
+
+    results = await (ParallelFetch()
+                     .add('employment', lambda: first_response_body(
+                         client.hris.employments.retrieve_many(requests=request_body)))
+                     .add('individual', lambda: first_response_body(
+                         client.hris.individuals.retrieve_many(requests=request_body)))
+                     .run())
+
+    # Handles compatibility issues with custom messages
+    employment_data, employment_error = results['employment']
+    if employment_error is not None:
+        employment_error = upstream_error_message(employment_error, "Employment")
+    individual_data, individual_error = results['individual']
+    if individual_error is not None:
+        individual_error = upstream_error_message(individual_error, "Individual")
 
     return {
         'individual': individual_data,
@@ -527,138 +3201,167 @@ def get_employee_data(employee_id):
     }
 
 @app.route('/api/employee/<employee_id>')
-def api_employee_detail(employee_id):
+@accepts_fields
+async def api_employee_detail(employee_id):
     """API endpoint that returns employee data as JSON"""
     try:
-        data = get_employee_data(employee_id)
+        # Registry and snapshot reads touch the disk, so they run off the shared event loop
+        connection = await asyncio.to_thread(get_active_connection)
+        snapshot = await asyncio.to_thread(request_snapshot, connection)
+        data = None
+        if snapshot:
+            data = {
+                'individual': await asyncio.to_thread(
+                    snapshot_store.record, snapshot['connection_id'], 'individual', employee_id),
+                'employment': await asyncio.to_thread(
+                    snapshot_store.record, snapshot['connection_id'], 'employment', employee_id),
+                'individual_error': None,
+                'employment_error': None
+            }
+            if data['individual'] is None or data['employment'] is None:
+                # Not (fully) in the snapshot, fall back to live data
+                snapshot = data = None
+        if data is None:
+            data = await get_employee_data(employee_id, connection['access_token'] if connection else None)
         
-        # Convert Finch objects to dictionaries for JSON serialization
         result = {
-            'individual': data['individual'].__dict__ if data['individual'] else None,
-            'employment': data['employment'].__dict__ if data['employment'] else None,
+            'individual': data['individual'],
+            'employment': data['employment'],
             'individual_error': data['individual_error'],
             'employment_error': data['employment_error']
         }
+        if snapshot:
+            result['snapshot_synced_at'] = snapshot['synced_at']
         
-        # Handle nested objects that might need conversion
-        if result['individual']:
-            # Convert nested objects to dicts
-            for key, value in result['individual'].items():
-                if hasattr(value, '__dict__'):
-                    result['individual'][key] = value.__dict__
-                elif isinstance(value, list) and value and hasattr(value[0], '__dict__'):
-                    result['individual'][key] = [item.__dict__ for item in value]
-        
-        if result['employment']:
-            # Convert nested objects to dicts
-            for key, value in result['employment'].items():
-                if hasattr(value, '__dict__'):
-                    result['employment'][key] = value.__dict__
-                elif isinstance(value, list) and value and hasattr(value[0], '__dict__'):
-                    result['employment'][key] = [item.__dict__ for item in value]
-        
-        return jsonify(result)
+        return jsonify(json_data_for_request(result))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/employees/batch', methods=['POST'])
+@accepts_fields
+def api_employees_batch():
+    """API endpoint that returns individual and employment data for many employees"""
+    payload = request.get_json(silent=True) or {}
+    individual_ids = payload.get('individual_ids')
+    if not isinstance(individual_ids, list) or not all(isinstance(i, str) for i in individual_ids):
+        return jsonify({'error': 'individual_ids must be a list of strings'}), 400
+
+    # Drop duplicates but keep the caller's order
+    individual_ids = list(dict.fromkeys(individual_ids))
+    if not individual_ids:
+        return jsonify({'error': 'individual_ids must not be empty'}), 400
+    if len(individual_ids) > EMPLOYEE_BATCH_MAX_IDS:
+        return jsonify({'error': f'At most {EMPLOYEE_BATCH_MAX_IDS} individual_ids per request'}), 400
+
+    try:
+        client = get_finch_client()
+
+        # Employment and individual chunks are all requested at once
+        futures = []
+        for chunk in chunked(individual_ids, RETRIEVE_MANY_CHUNK_SIZE):
+            futures.append(('employment', upstream_executor.submit(
+                retrieve_many_by_individual, client.hris.employments.retrieve_many, chunk, 'Employment')))
+            futures.append(('individual', upstream_executor.submit(
+                retrieve_many_by_individual, client.hris.individuals.retrieve_many, chunk, 'Individual')))
+
+        employees = {
+            individual_id: {
+                'individual': None,
+                'employment': None,
+                'individual_error': None,
+                'employment_error': None
+            }
+            for individual_id in individual_ids
+        }
+        for kind, future in futures:
+            for individual_id, (body, error) in future.result().items():
+                if individual_id not in employees:
+                    continue
+                employees[individual_id][kind] = body
+                employees[individual_id][f'{kind}_error'] = error
+
+        return jsonify(json_data_for_request({
+            'employees': employees,
+            'total': len(employees)
+        }))
+    except Exception as e:
+        return jsonify({'error': f'Unexpected error: {e}'}), 500
+
+
 @app.route('/api/employee/<employee_id>/payments')
+@requires_products('payment')
+@accepts_fields
 def api_employee_payments(employee_id):
     """API endpoint that returns payment data for a specific employee"""
     try:
-        client = Finch(
-            access_token=get_latest_access_token(),
-        )
-        
-        # Get payments for the last 90 days to have a good range
-        from datetime import datetime, timedelta
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
-        
-        # Get all payments
-        payments = client.hris.payments.list(
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        employee_payments = []
+        start_date, end_date = parse_date_window(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date range: {e}'}), 400
+
+    try:
+        # Client and connection_id come from the same row, so a concurrent
+        # switch of the active connection cannot mix two connections' data
+        active_conn = get_active_connection()
+        if not active_conn:
+            return jsonify({'error': 'No active connection found'}), 400
+        client = get_finch_client(active_conn['access_token'])
+        connection_id = active_conn['connection_id']
+
+        # Get payments in the window, only syncing what is not stored yet
+        payments = payment_history.get_payments(client, connection_id, start_date, end_date)
         
         # Filter payments that include this employee
-        for payment in payments:
-            if payment.individual_ids and employee_id in payment.individual_ids:
-                # Get pay statements for this payment
-                try:
-                    pay_statement_response = client.hris.pay_statements.retrieve_many(
-                        requests=[{
-                            "payment_id": payment.id
-                        }]
-                    )
-                    
-                    # Find the pay statement for this specific employee
-                    employee_pay_statement = None
-                    if (pay_statement_response.responses and 
-                        pay_statement_response.responses[0].body and 
-                        pay_statement_response.responses[0].body.pay_statements):
-                        
-                        for pay_statement in pay_statement_response.responses[0].body.pay_statements:
-                            if pay_statement.individual_id == employee_id:
-                                employee_pay_statement = pay_statement
-                                break
-                    
-                    # Convert to dict for JSON serialization
-                    payment_data = {
-                        'payment_id': payment.id,
-                        'pay_date': payment.pay_date,
-                        'pay_period': {
-                            'start_date': payment.pay_period.start_date if payment.pay_period else None,
-                            'end_date': payment.pay_period.end_date if payment.pay_period else None
-                        } if payment.pay_period else None,
-                        'pay_statement': None,
-                        'pay_statement_error': None
-                    }
-                    
-                    if employee_pay_statement:
-                        # Convert pay statement to dict
-                        pay_statement_dict = employee_pay_statement.__dict__.copy()
-                        
-                        # Handle nested objects
-                        for key, value in pay_statement_dict.items():
-                            if hasattr(value, '__dict__'):
-                                pay_statement_dict[key] = value.__dict__
-                            elif isinstance(value, list) and value and hasattr(value[0], '__dict__'):
-                                pay_statement_dict[key] = [item.__dict__ for item in value]
-                        
-                        payment_data['pay_statement'] = pay_statement_dict
-                    else:
-                        payment_data['pay_statement_error'] = 'No pay statement found for this employee'
-                    
-                    employee_payments.append(payment_data)
-                    
-                except Exception as pay_stmt_error:
-                    # Still include the payment even if pay statement fails
-                    payment_data = {
-                        'payment_id': payment.id,
-                        'pay_date': payment.pay_date,
-                        'pay_period': {
-                            'start_date': payment.pay_period.start_date if payment.pay_period else None,
-                            'end_date': payment.pay_period.end_date if payment.pay_period else None
-                        } if payment.pay_period else None,
-                        'pay_statement': None,
-                        'pay_statement_error': f'Error fetching pay statement: {str(pay_stmt_error)}'
-                    }
-                    employee_payments.append(payment_data)
+        employee_payment_list = [
+            payment for payment in payments
+            if employee_id in payment['individual_ids']
+        ]
+
+        # Load every relevant payment's pay statements in one pass; without the
+        # pay_statement product the payments are still listed, each with an error
+        payment_ids = [payment['id'] for payment in employee_payment_list]
+        if missing_products(active_conn, ('pay_statement',)):
+            pay_statement_index = None
+            pay_statement_errors = dict.fromkeys(payment_ids, 'Pay statements not authorized for this connection')
+        else:
+            pay_statement_index, pay_statement_errors = load_pay_statements(client, connection_id, payment_ids)
+
+        employee_payments = []
+        for payment in employee_payment_list:
+            payment_data = {
+                'payment_id': payment['id'],
+                'pay_date': payment['pay_date'],
+                'pay_period': payment['pay_period'],
+                'pay_statement': None,
+                'pay_statement_error': None
+            }
+
+            if payment['id'] in pay_statement_errors:
+                # Still include the payment even if pay statement fails
+                payment_data['pay_statement_error'] = pay_statement_errors[payment['id']]
+            else:
+                employee_pay_statement = pay_statement_index.get(payment['id'], employee_id)
+                if employee_pay_statement:
+                    payment_data['pay_statement'] = employee_pay_statement
+                else:
+                    payment_data['pay_statement_error'] = 'No pay statement found for this employee'
+
+            employee_payments.append(payment_data)
         
         # Sort by pay date (most recent first)
         employee_payments.sort(key=lambda x: x['pay_date'] or '', reverse=True)
         
-        return jsonify({
+        return jsonify(json_data_for_request({
             'employee_id': employee_id,
             'payments': employee_payments,
             'date_range': f'{start_date} to {end_date}',
             'total_payments': len(employee_payments)
-        })
+        }))
         
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
         error_msg = f"API Error: {e}"
         if hasattr(e, 'status_code') and e.status_code == 501:
             error_msg = "Payment data unsupported for this provider"
@@ -677,7 +3380,7 @@ def api_active_connection():
             return jsonify({
                 'connection_id': active_conn['connection_id'],
                 'provider_id': active_conn['provider_id'],
-                'products': active_conn.get('products', '').split('|') if active_conn.get('products') else []
+                'products': [product for product in active_conn.get('products', '').split('|') if product]
             })
         else:
             return jsonify({'error': 'No active connection found'}), 404
@@ -685,216 +3388,233 @@ def api_active_connection():
         return jsonify({'error': f'Failed to get active connection: {str(e)}'}), 500
 
 
+def enrollment_error_message(error, benefit_id):
+    """Per-benefit error for the aggregate deductions payload"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code == 501:
+        return "Enrolled individuals data unsupported for this provider"
+    if is_circuit_open_error(error):
+        return "The provider is not responding, enrolled individuals are paused for a moment"
+    if status_code == 404:
+        return f"Benefit {benefit_id} not found"
+    if isinstance(error, APIError):
+        return f"Finch API Error: {error}"
+    return f"Unexpected error: {error}"
+
+def attach_enrolled_individuals(client, benefits, snapshot=None):
+    """Add an 'enrolled' entry to each benefit dict
+
+    Every benefit's enrolled_ids call and a single directory download run
+    concurrently, then each benefit is joined through one DirectoryIndex.
+    Snapshot enrollments and directory are used when the request is served
+    from a snapshot.
+    """
+    connection = get_active_connection()
+    connection_id = snapshot['connection_id'] if snapshot else None
+    enrolled_ids = {}
+    futures = {}
+    for benefit in benefits:
+        benefit_id = benefit.get('benefit_id')
+        if not benefit_id:
+            continue
+        enrollment = snapshot_store.record(connection_id, 'enrollment', benefit_id) if snapshot else None
+        if enrollment is not None:
+            enrolled_ids[benefit_id] = (enrollment['individual_ids'], None)
+        else:
+            futures[benefit_id] = upstream_executor.submit(
+                coalesced, connection, 'hris.benefits.individuals.enrolled_ids',
+                functools.partial(client.hris.benefits.individuals.enrolled_ids, benefit_id), benefit_id)
+
+    snapshot_directory = snapshot_store.records(connection_id, 'directory') if snapshot else []
+    directory_future = None
+    if not snapshot_directory:
+        directory_future = upstream_executor.submit(get_directory_index, connection)
+
+    for benefit_id, future in futures.items():
+        try:
+            enrolled_ids[benefit_id] = (list(future.result().individual_ids or []), None)
+        except Exception as e:
+            logger.warning("Could not load enrolled individuals for %s: %s", benefit_id, e)
+            enrolled_ids[benefit_id] = (None, enrollment_error_message(e, benefit_id))
+
+    directory_index = None
+    try:
+        directory_index = DirectoryIndex(snapshot_directory) if snapshot_directory else directory_future.result()
+    except Exception as e:
+        logger.warning("Error fetching directory data: %s", e)
+
+    for benefit in benefits:
+        individual_ids, error = enrolled_ids.get(benefit.get('benefit_id'), ([], None))
+        if error is not None:
+            benefit['enrolled'] = {'error': error}
+            continue
+        records = enrolled_individual_records(individual_ids, directory_index)
+        benefit['enrolled'] = {
+            'enrolled_individuals': records,
+            'total_enrolled': len(records)
+        }
+
 @app.route('/api/deductions')
+@requires_products(*BENEFITS_PRODUCTS)
+@accepts_fields
 def api_deductions():
-    """API endpoint that returns all company benefits/deductions"""
-    print("\n" + "="*80)
-    print("DEDUCTIONS API ENDPOINT CALLED")
-    print("="*80)
-    
+    """API endpoint that returns all company benefits/deductions
+
+    With ?include=enrolled each benefit also carries its enrolled individuals.
+    """
     try:
-        # Get access token
-        access_token = get_latest_access_token()
-        print(f"Access token retrieved: {access_token[:20]}..." if access_token else "No access token")
-        
-        client = Finch(
-            access_token=access_token,
-        )
-        print("Finch client created successfully")
+        client = get_finch_client()
+        snapshot = request_snapshot(get_active_connection())
         
         # Get all company benefits/deductions
-        print("Attempting to fetch benefits from Finch API...")
-        benefits = client.hris.benefits.list()
-        print(f"Benefits fetched successfully. Type: {type(benefits)}")
-        print(f"Benefits object: {benefits}")
-        
-        # Convert benefits to list of dictionaries for JSON serialization
-        benefits_list = []
-        benefit_count = 0
-        
-        print("Processing benefits...")
-        for benefit in benefits:
-            benefit_count += 1
-            print(f"Processing benefit {benefit_count}: {benefit}")
-            print(f"Benefit type: {type(benefit)}")
-            print(f"Benefit attributes: {dir(benefit)}")
-            
-            try:
-                benefit_data = {
-                    'benefit_id': getattr(benefit, 'benefit_id', None),
-                    'type': getattr(benefit, 'type', None),
-                    'description': getattr(benefit, 'description', None),
-                    'frequency': getattr(benefit, 'frequency', None),
-                    'company_contribution': None
-                }
-                print(f"Basic benefit data: {benefit_data}")
-                
-                # Handle company contribution if present
-                if hasattr(benefit, 'company_contribution') and benefit.company_contribution:
-                    print(f"Processing company contribution: {benefit.company_contribution}")
-                    contribution_data = {
-                        'type': getattr(benefit.company_contribution, 'type', None),
-                        'tiers': []
-                    }
-                    
-                    # Handle tiers if present
-                    if hasattr(benefit.company_contribution, 'tiers') and benefit.company_contribution.tiers:
-                        print(f"Processing tiers: {benefit.company_contribution.tiers}")
-                        for tier_idx, tier in enumerate(benefit.company_contribution.tiers):
-                            print(f"Processing tier {tier_idx}: {tier}")
-                            tier_data = {}
-                            if hasattr(tier, 'threshold'):
-                                tier_data['threshold'] = tier.threshold
-                            if hasattr(tier, 'match'):
-                                tier_data['match'] = tier.match
-                            contribution_data['tiers'].append(tier_data)
-                            print(f"Tier data: {tier_data}")
-                    
-                    benefit_data['company_contribution'] = contribution_data
-                    print(f"Final contribution data: {contribution_data}")
-                
-                benefits_list.append(benefit_data)
-                print(f"Benefit {benefit_count} processed successfully")
-                
-            except Exception as benefit_error:
-                print(f"Error processing benefit {benefit_count}: {benefit_error}")
-                print(f"Benefit object that caused error: {benefit}")
-                # Continue processing other benefits
-                continue
+        benefits = None
+        if snapshot and snapshot_store.has(snapshot['connection_id'], 'benefit'):
+            benefits = snapshot_store.records(snapshot['connection_id'], 'benefit')
+        if benefits is None:
+            snapshot = None
+            benefits = coalesced(get_active_connection(), 'hris.benefits.list', client.hris.benefits.list)
         
-        print(f"Total benefits processed: {len(benefits_list)}")
+        # Convert benefits to dictionaries; ?fields= is applied to the whole response below
+        benefits_list = [to_json_data(benefit) for benefit in benefits]
+        logger.debug("Total benefits processed: %d", len(benefits_list))
         
         response_data = {
             'benefits': benefits_list,
             'total_benefits': len(benefits_list)
         }
-        print(f"Final response data: {response_data}")
+        if request.args.get('include') == 'enrolled':
+            attach_enrolled_individuals(client, benefits_list, snapshot)
+        if snapshot:
+            response_data['snapshot_synced_at'] = snapshot['synced_at']
         
-        return jsonify(response_data)
+        return jsonify(json_data_for_request(response_data))
         
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
         error_msg = f"Finch API Error: {e}"
-        print(f"API ERROR: {error_msg}")
-        print(f"API Error details - Status: {getattr(e, 'status_code', 'Unknown')}")
-        print(f"API Error details - Response: {getattr(e, 'response', 'Unknown')}")
-        print(f"API Error details - Body: {getattr(e, 'body', 'Unknown')}")
+        logger.warning("Finch API error (status %s): %s", getattr(e, 'status_code', 'Unknown'), e)
+        logger.debug("Finch API error body: %s", getattr(e, 'body', 'Unknown'))
         
         # Check for insufficient scope error (403)
-        if hasattr(e, 'status_code') and e.status_code == 403:
-            # Try to parse the error body for scope information
-            error_body = getattr(e, 'body', {})
-            if isinstance(error_body, dict):
-                error_code = error_body.get('code')
-                error_name = error_body.get('name')
-                error_message = error_body.get('message', '')
-                
-                print(f"Error code: {error_code}")
-                print(f"Error name: {error_name}")
-                print(f"Error message: {error_message}")
-                
-                if error_name == 'insufficient_scope_error':
-                    # Extract missing scopes from the error message
-                    missing_scopes = []
-                    if 'Missing scopes:' in error_message:
-                        # Parse something like "Missing scopes: [benefits]"
-                        import re
-                        scope_match = re.search(r'Missing scopes:\s*\[([^\]]+)\]', error_message)
-                        if scope_match:
-                            scopes_str = scope_match.group(1)
-                            missing_scopes = [scope.strip().strip('"\'') for scope in scopes_str.split(',')]
-                    
-                    print(f"Parsed missing scopes: {missing_scopes}")
-                    
-                    # Get current connection ID for reauth URL
-                    active_conn = get_active_connection()
-                    connection_id = active_conn['connection_id'] if active_conn else None
-                    
-                    response_data = {
-                        'error_type': 'insufficient_scope',
-                        'missing_scopes': missing_scopes,
-                        'reauth_url': f'/reauth/{connection_id}' if connection_id else None,
-                        'message': f'Additional permissions needed: {", ".join(missing_scopes)}' if missing_scopes else 'Additional permissions needed',
-                        'connection_id': connection_id
-                    }
-                    
-                    print(f"Returning structured error response: {response_data}")
-                    return jsonify(response_data), 403
+        missing_scopes = missing_scopes_from_error(e)
+        if missing_scopes is not None:
+            logger.info("Missing scopes: %s", missing_scopes)
+            active_conn = get_active_connection()
+            # Remember them, so the next request is answered without calling Finch
+            connection_registry.revoke_products(active_conn['connection_id'] if active_conn else None, missing_scopes)
+            return insufficient_scope_response(missing_scopes, active_conn)
         
         if hasattr(e, 'status_code') and e.status_code == 501:
             error_msg = "Benefits/deductions data unsupported for this provider"
         return jsonify({'error': error_msg}), 400
     except Exception as e:
         error_msg = f"Unexpected error: {e}"
-        print(f"UNEXPECTED ERROR: {error_msg}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error")
         return jsonify({'error': error_msg}), 500
 
 
+@app.route('/export/<dataset>')
+def export_dataset(dataset):
+    """Stream a whole dataset for the active connection as CSV (default) or NDJSON (?format=ndjson)
+
+    Pay statements cover the ?start_date=&end_date= window (last 90 days by default).
+    """
+    if dataset not in EXPORT_DATASETS:
+        return jsonify({'error': f"Unknown dataset {dataset}, expected one of: {', '.join(EXPORT_DATASETS)}"}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    active_conn = get_active_connection()
+    if not active_conn:
+        return jsonify({'error': 'No active connection found'}), 400
+    model, products, extra_columns = EXPORT_DATASETS[dataset]
+    missing = missing_products(active_conn, products)
+    if missing:
+        return insufficient_scope_response(missing, active_conn)
+
+    start_date = end_date = None
+    if dataset == 'pay_statements':
+        try:
+            start_date, end_date = parse_date_window(request.args)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date range: {e}'}), 400
+
+    # The first batch is fetched before answering, so a bad token, missing scope
+    # or open circuit gets a proper error status rather than a truncated 200
+    client = get_finch_client(active_conn['access_token'])
+    batches = read_ahead(export_batches(dataset, client, active_conn['connection_id'], start_date, end_date))
+    try:
+        first_batch = next(batches, None)
+    except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
+        missing_scopes = missing_scopes_from_error(e)
+        if missing_scopes is not None:
+            # Remember them, so the next request is answered without calling Finch
+            connection_registry.revoke_products(active_conn['connection_id'], missing_scopes)
+            return insufficient_scope_response(missing_scopes, active_conn)
+        return jsonify({'error': upstream_error_message(e, "Export")}), 400
+    except Exception as e:
+        logger.exception("Unexpected error")
+        return jsonify({'error': f"Unexpected error: {e}"}), 500
+    if first_batch is not None:
+        batches = itertools.chain([first_batch], batches)
+
+    if export_format == 'csv':
+        body, mimetype = write_csv(batches, [*extra_columns, *model_columns(model)]), 'text/csv'
+    else:
+        body, mimetype = write_ndjson(batches), 'application/x-ndjson'
+
+    filename = f"{dataset}-{active_conn['connection_id']}.{export_format}"
+    return app.response_class(body, mimetype=mimetype,
+                              headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for routes and Finch API calls"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
 # Jobs API Endpoints
 @app.route('/api/jobs/enqueue', methods=['POST'])
 def enqueue_job():
     """API endpoint to enqueue a new data sync job"""
-    print("\n" + "="*80)
-    print("ENQUEUE JOB API ENDPOINT CALLED")
-    print("="*80)
-    
     try:
         # Get active connection
         active_conn = get_active_connection()
         if not active_conn:
             return jsonify({'error': 'No active connection found'}), 400
         
-        print(f"Active connection: {active_conn['connection_id']} ({active_conn['provider_id']})")
-        
-        # Create Finch client
-        client = Finch(access_token=active_conn['access_token'])
-        
-        # Create job via Finch API
-        print("Creating data_sync_all job via Finch API...")
-        job_response = client.jobs.automated.create(type="data_sync_all")
-        print(f"Job created successfully: {job_response}")
-        
-        # Prepare job data for CSV
-        job_data = {
-            'job_id': job_response.job_id,
-            'connection_id': active_conn['connection_id'],
-            'provider_id': active_conn['provider_id'],
-            'job_type': 'data_sync_all',
-            'status': 'pending',
-            'created_at': datetime.now().isoformat(),
-            'scheduled_at': getattr(job_response, 'scheduled_at', ''),
-            'started_at': '',
-            'completed_at': '',
-            'job_url': job_response.job_url,
-            'allowed_refreshes': job_response.allowed_refreshes,
-            'remaining_refreshes': job_response.remaining_refreshes,
-            'error_message': ''
-        }
-        
-        # Save to CSV
-        print("Saving job to CSV...")
-        save_job_to_csv(job_data)
-        print("Job saved to CSV successfully")
+        # Create the job via Finch API, save it and hand it to the background poller
+        job_data = create_sync_job(active_conn)
         
         # Clean up old jobs periodically
         cleanup_old_jobs()
         
         return jsonify({
-            'job_id': job_response.job_id,
-            'job_url': job_response.job_url,
+            'job_id': job_data['job_id'],
+            'job_url': job_data['job_url'],
             'status': 'pending',
-            'allowed_refreshes': job_response.allowed_refreshes,
-            'remaining_refreshes': job_response.remaining_refreshes,
+            'allowed_refreshes': job_data['allowed_refreshes'],
+            'remaining_refreshes': job_data['remaining_refreshes'],
             'created_at': job_data['created_at'],
             'connection_id': active_conn['connection_id'],
             'provider_id': active_conn['provider_id']
         })
         
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
         error_msg = f"Finch API Error: {e}"
-        print(f"API ERROR: {error_msg}")
+        logger.warning("Finch API error (status %s): %s", getattr(e, 'status_code', 'Unknown'), e)
         
         if hasattr(e, 'status_code') and e.status_code == 501:
             error_msg = "Automated jobs unsupported for this provider"
@@ -904,69 +3624,88 @@ def enqueue_job():
         return jsonify({'error': error_msg}), getattr(e, 'status_code', 400)
     except Exception as e:
         error_msg = f"Unexpected error: {e}"
-        print(f"UNEXPECTED ERROR: {error_msg}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error")
         return jsonify({'error': error_msg}), 500
 
+@app.route('/api/jobs/bulk-sync', methods=['POST'])
+def start_bulk_sync():
+    """API endpoint to create data_sync_all jobs across connections in the background
+
+    JSON body (all optional): connection_ids (default: every connection),
+    window_seconds, per_provider and dry_run.
+    """
+    body = request.get_json(silent=True) or {}
+    connection_ids = body.get('connection_ids')
+    if connection_ids is not None and not isinstance(connection_ids, list):
+        return jsonify({'error': 'connection_ids must be a list'}), 400
+    try:
+        window = float(body.get('window_seconds', BULK_SYNC_WINDOW))
+        per_provider = int(body.get('per_provider', BULK_SYNC_PROVIDER_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'window_seconds and per_provider must be numbers'}), 400
+
+    connections, unknown = bulk_sync_targets(connection_ids)
+    if unknown:
+        return jsonify({'error': f"Unknown connections: {', '.join(unknown)}"}), 400
+    if not connections:
+        return jsonify({'error': 'No connections to sync'}), 400
+
+    try:
+        bulk_sync = BulkSync(connections, window=window, per_provider=per_provider)
+    except Exception as e:
+        logger.exception("Unexpected error")
+        return jsonify({'error': f"Unexpected error: {e}"}), 500
+    if not body.get('dry_run'):
+        track_bulk_sync(bulk_sync)
+        threading.Thread(target=bulk_sync.run, name=bulk_sync.batch_id, daemon=True).start()
+    return jsonify({**bulk_sync.summary(), 'dry_run': bool(body.get('dry_run'))}), 202
+
+@app.route('/api/jobs/bulk-sync/<batch_id>')
+def get_bulk_sync(batch_id):
+    """API endpoint to report the jobs a bulk sync has recorded so far"""
+    jobs = job_store.for_batch(batch_id)
+    not_started = job_store.batch_results(batch_id)
+    with bulk_syncs_lock:
+        bulk_sync = bulk_syncs.get(batch_id)
+    if not jobs and not not_started and bulk_sync is None:
+        return jsonify({'error': f"Bulk sync {batch_id} not found"}), 404
+    counts = {}
+    for row in jobs + not_started:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+    response_data = {'batch_id': batch_id, 'counts': counts, 'jobs': jobs, 'not_started': not_started}
+    if bulk_sync is not None:
+        # Started by this process, so the schedule is known as well
+        response_data['connections_planned'] = len(bulk_sync.plan)
+    return jsonify(response_data)
+
 @app.route('/api/jobs/status/<job_id>')
 def get_job_status(job_id):
     """API endpoint to get job status"""
-    print(f"\n{'='*80}")
-    print(f"GET JOB STATUS API ENDPOINT CALLED")
-    print(f"Job ID: {job_id}")
-    print(f"{'='*80}")
-    
     try:
         # Get active connection details
         active_conn = get_active_connection()
-        print(f"Active connection: {active_conn}")
-        
         if not active_conn:
-            print("ERROR: No active connection found")
+            logger.warning("Job status requested for %s with no active connection", job_id)
             return jsonify({'error': 'No active connection found'}), 400
         
-        # Get current status from Finch API
-        access_token = get_latest_access_token()
-        print(f"Access token from get_latest_access_token(): {access_token[:20] + '...' if access_token else 'None'}")
-        print(f"Access token from active_conn: {active_conn['access_token'][:20] + '...' if active_conn.get('access_token') else 'None'}")
-        print(f"Connection ID: {active_conn.get('connection_id')}")
-        print(f"Provider ID: {active_conn.get('provider_id')}")
-        
+        # Use the access token directly from active connection
+        access_token = active_conn.get('access_token')
         if not access_token:
-            print("ERROR: No access token available")
+            logger.warning("Job status requested for %s with no access token", job_id)
             return jsonify({'error': 'No access token available'}), 401
         
-        # Use the access token directly from active connection to be sure
-        final_access_token = active_conn['access_token']
-        print(f"Using final access token: {final_access_token[:20] + '...' if final_access_token else 'None'}")
+        client = get_finch_client(access_token)
         
-        client = Finch(access_token=final_access_token)
-        print("Finch client created successfully")
-        print("Fetching job status from Finch API...")
-        
-        # Add more detailed error handling for the API call
+        # Get current status from Finch API
         try:
             job_status = client.jobs.automated.retrieve(job_id)
-            print(f"Job status retrieved successfully: {job_status}")
+            logger.debug("Job status for %s: %s", job_id, job_status)
         except APIError as api_error:
-            print(f"Finch API Error during retrieve: {api_error}")
-            print(f"API Error status code: {getattr(api_error, 'status_code', 'Unknown')}")
-            print(f"API Error response: {getattr(api_error, 'response', 'Unknown')}")
-            print(f"API Error body: {getattr(api_error, 'body', 'Unknown')}")
+            logger.debug("Finch API error body during job retrieve: %s", getattr(api_error, 'body', 'Unknown'))
             raise api_error
         
-        # Update CSV with latest status
-        status_data = {
-            'status': job_status.status,
-            'started_at': getattr(job_status, 'started_at', ''),
-            'completed_at': getattr(job_status, 'completed_at', ''),
-            'scheduled_at': getattr(job_status, 'scheduled_at', '')
-        }
-        
-        print("Updating job status in CSV...")
-        update_job_status(job_id, status_data)
-        print("Job status updated in CSV")
+        # Update the job store with latest status (only written if it changed)
+        record_job_status(job_id, job_status)
         
         # Convert job status to dict for JSON response
         response_data = {
@@ -984,8 +3723,11 @@ def get_job_status(job_id):
         return jsonify(response_data)
         
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
         error_msg = f"Finch API Error: {e}"
-        print(f"API ERROR: {error_msg}")
+        logger.warning("Finch API error (status %s): %s", getattr(e, 'status_code', 'Unknown'), e)
         
         if hasattr(e, 'status_code') and e.status_code == 404:
             error_msg = f"Job {job_id} not found"
@@ -995,29 +3737,21 @@ def get_job_status(job_id):
         return jsonify({'error': error_msg}), getattr(e, 'status_code', 400)
     except Exception as e:
         error_msg = f"Unexpected error: {e}"
-        print(f"UNEXPECTED ERROR: {error_msg}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error")
         return jsonify({'error': error_msg}), 500
 
 @app.route('/api/jobs/list')
 def list_jobs():
     """API endpoint to list jobs for active connection"""
-    print("\n" + "="*80)
-    print("LIST JOBS API ENDPOINT CALLED")
-    print("="*80)
-    
     try:
         # Get active connection
         active_conn = get_active_connection()
         if not active_conn:
             return jsonify({'error': 'No active connection found'}), 400
         
-        print(f"Getting jobs for connection: {active_conn['connection_id']}")
-        
-        # Get jobs from CSV
+        # Get jobs from the job store
         jobs = get_jobs_for_connection(active_conn['connection_id'])
-        print(f"Found {len(jobs)} jobs in CSV")
+        logger.debug("Found %d jobs for connection %s", len(jobs), active_conn['connection_id'])
         
         # Format jobs for response
         formatted_jobs = []
@@ -1033,7 +3767,8 @@ def list_jobs():
                 'job_url': job['job_url'],
                 'allowed_refreshes': job['allowed_refreshes'],
                 'remaining_refreshes': job['remaining_refreshes'],
-                'error_message': job['error_message']
+                'error_message': job['error_message'],
+                'batch_id': job['batch_id']
             }
             formatted_jobs.append(formatted_job)
         
@@ -1046,162 +3781,108 @@ def list_jobs():
         
     except Exception as e:
         error_msg = f"Unexpected error: {e}"
-        print(f"UNEXPECTED ERROR: {error_msg}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error")
         return jsonify({'error': error_msg}), 500
 
+@app.route('/api/jobs/stream')
+def stream_jobs():
+    """Server-Sent Events stream of job updates for the active connection"""
+    active_conn = get_active_connection()
+    if not active_conn:
+        return jsonify({'error': 'No active connection found'}), 400
+
+    connection_id = active_conn['connection_id']
+    subscription = job_events.subscribe(connection_id)
+
+    def generate():
+        try:
+            # Start with the current jobs so the page needs no separate list call
+            yield format_sse('snapshot', {'jobs': get_jobs_for_connection(connection_id)})
+            while True:
+                try:
+                    job = subscription.get(timeout=JOB_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse('job', job)
+        finally:
+            job_events.unsubscribe(subscription)
+
+    return app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/deductions/<benefit_id>/enrolled')
+@requires_products(*BENEFITS_PRODUCTS)
 def api_benefit_enrolled_individuals(benefit_id):
     """API endpoint that returns enrolled individuals for a specific benefit"""
-    print(f"\n{'='*80}")
-    print(f"BENEFIT ENROLLED INDIVIDUALS API ENDPOINT CALLED")
-    print(f"Benefit ID: {benefit_id}")
-    print(f"{'='*80}")
-    
     try:
-        # Get access token
-        access_token = get_latest_access_token()
-        print(f"Access token retrieved: {access_token[:20]}..." if access_token else "No access token")
-        
-        client = Finch(
-            access_token=access_token,
-        )
-        print("Finch client created successfully")
+        client = get_finch_client()
+        snapshot = request_snapshot(get_active_connection())
+        enrollment = snapshot_store.record(snapshot['connection_id'], 'enrollment', benefit_id) if snapshot else None
+        snapshot_fields = {'snapshot_synced_at': snapshot['synced_at']} if enrollment is not None else {}
         
         # Get enrolled individuals for the benefit
-        print(f"Attempting to fetch enrolled individuals for benefit: {benefit_id}")
-        enrolled_response = client.hris.benefits.individuals.enrolled_ids(benefit_id)
-        print(f"Enrolled individuals response: {enrolled_response}")
-        
-        # Extract individual IDs
-        individual_ids = getattr(enrolled_response, 'individual_ids', [])
-        print(f"Individual IDs found: {individual_ids}")
+        if enrollment is not None:
+            individual_ids = enrollment['individual_ids']
+        else:
+            enrolled_response = coalesced(
+                get_active_connection(), 'hris.benefits.individuals.enrolled_ids',
+                functools.partial(client.hris.benefits.individuals.enrolled_ids, benefit_id), benefit_id)
+            logger.debug("Enrolled individuals response for %s: %s", benefit_id, enrolled_response)
+            
+            # Extract individual IDs
+            individual_ids = getattr(enrolled_response, 'individual_ids', [])
         
         # If no individuals are enrolled, return empty result
         if not individual_ids:
             return jsonify({
                 'benefit_id': benefit_id,
                 'enrolled_individuals': [],
-                'total_enrolled': 0
+                'total_enrolled': 0,
+                **snapshot_fields
             })
         
-        # Fetch basic employee data for each enrolled individual
-        print("Fetching employee data for enrolled individuals...")
-        enrolled_employees = []
-        
         # Get directory data to match individual IDs with employee info
+        directory_index = None
         try:
-            directory_response = client.hris.directory.list()
-            directory_individuals = directory_response.individuals
-            print(f"Directory individuals count: {len(directory_individuals)}")
-            
-            # Create a lookup map for quick access
-            directory_map = {individual.id: individual for individual in directory_individuals}
-            
-            for individual_id in individual_ids:
-                if individual_id in directory_map:
-                    individual = directory_map[individual_id]
-                    
-                    # Create employee data structure
-                    employee_data = {
-                        'id': individual.id,
-                        'first_name': getattr(individual, 'first_name', None),
-                        'last_name': getattr(individual, 'last_name', None),
-                        'preferred_name': getattr(individual, 'preferred_name', None),
-                        'is_active': getattr(individual, 'is_active', None),
-                        'department': None,
-                        'manager': None
-                    }
-                    
-                    # Add department info if available
-                    if hasattr(individual, 'department') and individual.department:
-                        employee_data['department'] = {
-                            'name': getattr(individual.department, 'name', None)
-                        }
-                    
-                    # Add manager info if available
-                    if hasattr(individual, 'manager') and individual.manager:
-                        employee_data['manager'] = {
-                            'id': getattr(individual.manager, 'id', None)
-                        }
-                    
-                    enrolled_employees.append(employee_data)
-                    print(f"Added employee data for {individual_id}: {employee_data['first_name']} {employee_data['last_name']}")
-                else:
-                    print(f"Warning: Individual {individual_id} not found in directory")
-                    # Still add a minimal record
-                    enrolled_employees.append({
-                        'id': individual_id,
-                        'first_name': None,
-                        'last_name': None,
-                        'preferred_name': None,
-                        'is_active': None,
-                        'department': None,
-                        'manager': None
-                    })
-        
+            directory = None
+            if enrollment is not None:
+                directory = snapshot_store.records(snapshot['connection_id'], 'directory') or None
+            directory_index = DirectoryIndex(directory) if directory else get_directory_index()
         except Exception as directory_error:
-            print(f"Error fetching directory data: {directory_error}")
             # Fallback: return just the IDs without enriched data
-            enrolled_employees = [{'id': individual_id} for individual_id in individual_ids]
+            logger.warning("Error fetching directory data: %s", directory_error)
+        
+        # Fetch basic employee data for each enrolled individual
+        enrolled_employees = enrolled_individual_records(individual_ids, directory_index)
         
         response_data = {
             'benefit_id': benefit_id,
             'enrolled_individuals': enrolled_employees,
-            'total_enrolled': len(enrolled_employees)
+            'total_enrolled': len(enrolled_employees),
+            **snapshot_fields
         }
         
-        print(f"Final enrolled individuals response: {response_data}")
         return jsonify(response_data)
         
     except APIError as e:
+        unavailable = provider_unavailable_response(e)
+        if unavailable is not None:
+            return unavailable
         error_msg = f"Finch API Error: {e}"
-        print(f"API ERROR: {error_msg}")
-        print(f"API Error details - Status: {getattr(e, 'status_code', 'Unknown')}")
-        print(f"API Error details - Response: {getattr(e, 'response', 'Unknown')}")
-        print(f"API Error details - Body: {getattr(e, 'body', 'Unknown')}")
+        logger.warning("Finch API error (status %s): %s", getattr(e, 'status_code', 'Unknown'), e)
+        logger.debug("Finch API error body: %s", getattr(e, 'body', 'Unknown'))
         
         # Check for insufficient scope error (403)
-        if hasattr(e, 'status_code') and e.status_code == 403:
-            # Try to parse the error body for scope information
-            error_body = getattr(e, 'body', {})
-            if isinstance(error_body, dict):
-                error_code = error_body.get('code')
-                error_name = error_body.get('name')
-                error_message = error_body.get('message', '')
-                
-                print(f"Error code: {error_code}")
-                print(f"Error name: {error_name}")
-                print(f"Error message: {error_message}")
-                
-                if error_name == 'insufficient_scope_error':
-                    # Extract missing scopes from the error message
-                    missing_scopes = []
-                    if 'Missing scopes:' in error_message:
-                        # Parse something like "Missing scopes: [benefits]"
-                        import re
-                        scope_match = re.search(r'Missing scopes:\s*\[([^\]]+)\]', error_message)
-                        if scope_match:
-                            scopes_str = scope_match.group(1)
-                            missing_scopes = [scope.strip().strip('"\'') for scope in scopes_str.split(',')]
-                    
-                    print(f"Parsed missing scopes: {missing_scopes}")
-                    
-                    # Get current connection ID for reauth URL
-                    active_conn = get_active_connection()
-                    connection_id = active_conn['connection_id'] if active_conn else None
-                    
-                    response_data = {
-                        'error_type': 'insufficient_scope',
-                        'missing_scopes': missing_scopes,
-                        'reauth_url': f'/reauth/{connection_id}' if connection_id else None,
-                        'message': f'Additional permissions needed: {", ".join(missing_scopes)}' if missing_scopes else 'Additional permissions needed',
-                        'connection_id': connection_id
-                    }
-                    
-                    print(f"Returning structured error response: {response_data}")
-                    return jsonify(response_data), 403
+        missing_scopes = missing_scopes_from_error(e)
+        if missing_scopes is not None:
+            logger.info("Missing scopes: %s", missing_scopes)
+            active_conn = get_active_connection()
+            # Remember them, so the next request is answered without calling Finch
+            connection_registry.revoke_products(active_conn['connection_id'] if active_conn else None, missing_scopes)
+            return insufficient_scope_response(missing_scopes, active_conn)
         
         if hasattr(e, 'status_code') and e.status_code == 501:
             error_msg = "Enrolled individuals data unsupported for this provider"
@@ -1210,10 +3891,7 @@ def api_benefit_enrolled_individuals(benefit_id):
         return jsonify({'error': error_msg}), getattr(e, 'status_code', 400)
     except Exception as e:
         error_msg = f"Unexpected error: {e}"
-        print(f"UNEXPECTED ERROR: {error_msg}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error")
         return jsonify({'error': error_msg}), 500
 
 
@@ -0,0 +1,187 @@
+"""Throughput and latency benchmark for the demo app against the fake Finch server
+
+Starts fake_finch.py and the Flask app (threaded) in-process, seeds a temporary
+data directory with the fake connections, then drives each endpoint at
+increasing concurrency and reports p50/p95/p99 latency and requests/second:
+
+    python3 benchmark.py --concurrency 1,4,16 --requests 200 --employees 2000
+
+Pass --fake-url to use an already running fake server instead (its companies
+must match --companies), and --json to save the results for comparison.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import fake_finch
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Scenario:
+    """One endpoint to drive; `path` may be a callable so each request can vary"""
+
+    def __init__(self, name, path, method='GET'):
+        self.name = name
+        self.path = path
+        self.method = method
+
+    def request(self, http, n):
+        path = self.path(n) if callable(self.path) else self.path
+        return http.request(self.method, path)
+
+
+def build_scenarios(http, fake):
+    """Scenarios for every benchmarked endpoint, using ids from the fake data"""
+    company = next(iter(fake.companies.values()))
+    employee_ids = [individual['id'] for individual in company.individuals]
+    benefit_ids = [benefit['benefit_id'] for benefit in company.benefits]
+
+    # A job to poll, created through the app so it is in the job store
+    job_id = http.post('/api/jobs/enqueue').json().get('job_id')
+
+    scenarios = [
+        Scenario('home', '/'),
+        Scenario('directory', '/directory'),
+        Scenario('employee', lambda n: f"/api/employee/{employee_ids[n % len(employee_ids)]}"),
+        Scenario('employee_payments', lambda n: f"/api/employee/{employee_ids[n % len(employee_ids)]}/payments"),
+        Scenario('deductions', '/api/deductions'),
+        Scenario('jobs_list', '/api/jobs/list'),
+        Scenario('jobs_enqueue', '/api/jobs/enqueue', method='POST'),
+    ]
+    if benefit_ids:
+        scenarios.append(Scenario('deductions_enrolled',
+                                  lambda n: f"/api/deductions/{benefit_ids[n % len(benefit_ids)]}/enrolled"))
+    if job_id:
+        scenarios.append(Scenario('jobs_status', f"/api/jobs/status/{job_id}"))
+    return scenarios
+
+
+def run_level(base_url, scenario, concurrency, total_requests):
+    """Send total_requests to one scenario from `concurrency` workers"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        nonlocal errors
+        with httpx.Client(base_url=base_url, timeout=120) as http:
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = scenario.request(http, n)
+                    response.read()
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': scenario.name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'rps': len(latencies) / wall if wall else 0.0,
+    }
+
+
+def start_app(fake, fake_url, data_dir):
+    """Import the app against the fake server and serve it on a background thread"""
+    os.environ['FINCH_BASE_URL'] = fake_url
+    os.environ['DATA_DIR'] = data_dir
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('CLIENT_ID', 'fake-client')
+    os.environ.setdefault('CLIENT_SECRET', 'fake-secret')
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as demo_app
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    for row in fake.connection_rows():
+        demo_app.connection_registry.upsert(row)
+    # The first fake connection is the one the benchmark talks to
+    demo_app.set_active_connection(fake.connection_rows()[0]['connection_id'])
+
+    server = make_server('127.0.0.1', 0, demo_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-app', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_table(results):
+    print(f"{'scenario':<22}{'conc':>6}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for result in results:
+        print(f"{result['scenario']:<22}{result['concurrency']:>6}{result['requests']:>7}{result['errors']:>8}"
+              f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['rps']:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario and concurrency level')
+    parser.add_argument('--scenarios', default='', help='comma-separated scenario names to run (default: all)')
+    parser.add_argument('--fake-url', help='use a running fake_finch.py instead of starting one')
+    parser.add_argument('--json', help='write the results to this file')
+    fake_finch.add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    fake = fake_finch.fake_from_arguments(args)
+    fake_url = args.fake_url
+    if not fake_url:
+        fake_url = f"http://127.0.0.1:{fake_finch.start_server(fake).server_port}"
+
+    data_dir = tempfile.mkdtemp(prefix='finch-benchmark-')
+    base_url = start_app(fake, fake_url, data_dir)
+    print(f"App on {base_url}, fake Finch on {fake_url}, data in {data_dir}")
+
+    with httpx.Client(base_url=base_url, timeout=120) as http:
+        scenarios = build_scenarios(http, fake)
+    if args.scenarios:
+        wanted = set(args.scenarios.split(','))
+        scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+
+    results = []
+    for scenario in scenarios:
+        for concurrency in [int(level) for level in args.concurrency.split(',')]:
+            result = run_level(base_url, scenario, concurrency, args.requests)
+            results.append(result)
+            print(f"{scenario.name} x{concurrency}: p50 {result['p50_ms']:.1f} ms, "
+                  f"{result['rps']:.1f} req/s, {result['errors']} errors", flush=True)
+
+    print()
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=2)
@@ -0,0 +1,469 @@
+"""Offline stand-in for the Finch API, for benchmarking without the sandbox
+
+Serves synthetic companies over the endpoints this app calls. Each company is
+reached with the access token `fake-token-<n>`. Point the app (or the Finch
+SDK) at it with FINCH_BASE_URL:
+
+    python3 fake_finch.py --port 8765 --employees 2000 --payments 26
+    FINCH_BASE_URL=http://127.0.0.1:8765 python3 app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+PROVIDERS = ['gusto', 'bamboo_hr', 'adp_run', 'paychex_flex', 'rippling']
+DEPARTMENTS = ['Engineering', 'Sales', 'Support', 'Finance', 'Operations', 'Marketing']
+FIRST_NAMES = ['Ada', 'Grace', 'Alan', 'Edsger', 'Barbara', 'Ken', 'Margaret', 'Dennis', 'Frances', 'Linus']
+LAST_NAMES = ['Lovelace', 'Hopper', 'Turing', 'Dijkstra', 'Liskov', 'Thompson', 'Hamilton', 'Ritchie', 'Allen', 'Torvalds']
+BENEFIT_TYPES = ['401k', '401k_roth', 'hsa_pre', 's125_medical', 's125_dental', 's125_vision', 'fsa_medical']
+ALL_PRODUCTS = ['company', 'directory', 'individual', 'employment', 'payment', 'pay_statement', 'benefits']
+
+
+def money(amount):
+    return {'amount': amount, 'currency': 'usd'}
+
+
+class FakeCompany:
+    """Synthetic HRIS and payroll data for one connection, built deterministically from a seed"""
+
+    def __init__(self, index, employees, payments, benefits, seed):
+        rng = random.Random(f"{seed}-{index}")
+        self.index = index
+        self.access_token = f"fake-token-{index}"
+        self.connection_id = f"fake-connection-{index}"
+        self.company_id = f"fake-company-{index}"
+        self.provider_id = PROVIDERS[index % len(PROVIDERS)]
+        self.legal_name = f"Fake Company {index} Inc."
+
+        self.individuals = []
+        for n in range(employees):
+            department = rng.choice(DEPARTMENTS)
+            manager_id = self.individuals[rng.randrange(n)]['id'] if n else None
+            self.individuals.append({
+                'id': f"{self.company_id}-ind-{n:06d}",
+                'first_name': rng.choice(FIRST_NAMES),
+                'middle_name': None,
+                'last_name': rng.choice(LAST_NAMES),
+                'is_active': rng.random() > 0.05,
+                'department': {'name': department},
+                'manager': {'id': manager_id} if manager_id else None,
+                'salary': rng.randrange(40000, 250000, 500) * 100,
+            })
+        self.by_id = {individual['id']: individual for individual in self.individuals}
+
+        # Biweekly pay runs going back from today, each paying every employee
+        self.payments = []
+        pay_date = date.today()
+        for n in range(payments):
+            period_end = pay_date - timedelta(days=3)
+            self.payments.append({
+                'id': f"{self.company_id}-pay-{n:04d}",
+                'pay_date': pay_date.isoformat(),
+                'pay_period': {
+                    'start_date': (period_end - timedelta(days=13)).isoformat(),
+                    'end_date': period_end.isoformat()
+                },
+                'individual_ids': [individual['id'] for individual in self.individuals],
+            })
+            pay_date -= timedelta(days=14)
+        self.payments_by_id = {payment['id']: payment for payment in self.payments}
+
+        self.benefits = []
+        for n in range(benefits):
+            enrolled = [individual['id'] for individual in self.individuals if rng.random() < 0.6]
+            self.benefits.append({
+                'benefit_id': f"{self.company_id}-ben-{n:03d}",
+                'type': BENEFIT_TYPES[n % len(BENEFIT_TYPES)],
+                'description': f"Benefit {n}",
+                'frequency': 'every_paycheck',
+                'company_contribution': {'type': 'match', 'tiers': [{'threshold': 600, 'match': 100}]},
+                'enrolled_ids': enrolled,
+            })
+        self.benefits_by_id = {benefit['benefit_id']: benefit for benefit in self.benefits}
+
+    def company(self):
+        return {
+            'id': self.company_id,
+            'legal_name': self.legal_name,
+            'entity': {'type': 'llc', 'subtype': None},
+            'ein': f"12-{self.index:07d}",
+            'primary_email': f"payroll@company{self.index}.example",
+            'primary_phone_number': '5555550100',
+            'departments': [{'name': name, 'parent': None} for name in DEPARTMENTS],
+            'locations': [{'line1': '1 Main St', 'city': 'Springfield', 'state': 'IL',
+                           'postal_code': '62701', 'country': 'US'}],
+            'accounts': [],
+        }
+
+    def directory_entry(self, individual):
+        return {key: individual[key] for key in
+                ('id', 'first_name', 'middle_name', 'last_name', 'is_active', 'department', 'manager')}
+
+    def individual(self, individual):
+        return {
+            'id': individual['id'],
+            'first_name': individual['first_name'],
+            'middle_name': None,
+            'last_name': individual['last_name'],
+            'preferred_name': None,
+            'dob': '1990-01-01',
+            'gender': None,
+            'ethnicity': None,
+            'emails': [{'data': f"{individual['id']}@company{self.index}.example", 'type': 'work'}],
+            'phone_numbers': [],
+            'residence': {'line1': '2 Side St', 'city': 'Springfield', 'state': 'IL',
+                          'postal_code': '62701', 'country': 'US'},
+            'ssn': None,
+            'encrypted_ssn': None,
+        }
+
+    def employment(self, individual):
+        return {
+            'id': individual['id'],
+            'first_name': individual['first_name'],
+            'middle_name': None,
+            'last_name': individual['last_name'],
+            'title': 'Engineer',
+            'department': individual['department'],
+            'manager': individual['manager'],
+            'employment': {'type': 'employee', 'subtype': 'full_time'},
+            'start_date': '2020-01-06',
+            'end_date': None,
+            'is_active': individual['is_active'],
+            'class_code': None,
+            'location': None,
+            'income': {'unit': 'yearly', 'amount': individual['salary'], 'currency': 'usd',
+                       'effective_date': '2024-01-01'},
+            'income_history': [],
+            'custom_fields': [],
+        }
+
+    def pay_statement(self, individual):
+        gross = individual['salary'] // 26
+        tax = gross // 5
+        return {
+            'individual_id': individual['id'],
+            'type': 'regular_payroll',
+            'payment_method': 'direct_deposit',
+            'total_hours': 80,
+            'gross_pay': money(gross),
+            'net_pay': money(gross - tax),
+            'earnings': [{'type': 'salary', 'name': 'Salary', 'amount': gross, 'currency': 'usd', 'hours': 80}],
+            'taxes': [{'type': 'federal', 'name': 'Federal Income Tax', 'employer': False,
+                       'amount': tax, 'currency': 'usd'}],
+            'employee_deductions': [],
+            'employer_contributions': [],
+        }
+
+
+class FakeFinch:
+    """In-memory state shared by every request to the fake server"""
+
+    def __init__(self, companies, employees, payments, benefits, seed=0,
+                 latency=0.0, jitter=0.0, error_rate=0.0, job_duration=10.0):
+        self.companies = {}
+        for index in range(companies):
+            company = FakeCompany(index, employees, payments, benefits, seed)
+            self.companies[company.access_token] = company
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.job_duration = job_duration
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def connection_rows(self):
+        """tokens.csv rows for every fake connection"""
+        return [{
+            'access_token': company.access_token,
+            'token_type': 'bearer',
+            'connection_id': company.connection_id,
+            'customer_id': '',
+            'account_id': f"fake-account-{company.index}",
+            'client_type': 'sandbox',
+            'company_id': company.company_id,
+            'connection_type': 'provider',
+            'products': '|'.join(ALL_PRODUCTS),
+            'provider_id': company.provider_id,
+        } for company in self.companies.values()]
+
+    def delay(self):
+        """Simulated upstream latency; returns True if this call should fail"""
+        with self._lock:
+            wait_for = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            fail = self._rng.random() < self.error_rate
+        if wait_for:
+            time.sleep(wait_for)
+        return fail
+
+    def create_job(self, company):
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = (company.access_token, datetime.now(timezone.utc))
+        return {
+            'job_id': job_id,
+            'job_url': f"/jobs/automated/{job_id}",
+            'allowed_refreshes': 1000,
+            'remaining_refreshes': 999,
+        }
+
+    def job(self, company, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job[0] != company.access_token:
+            return None
+        created_at = job[1]
+        elapsed = (datetime.now(timezone.utc) - created_at).total_seconds()
+        started_at = created_at + timedelta(seconds=self.job_duration / 5)
+        if elapsed < self.job_duration / 5:
+            status, started, completed = 'pending', None, None
+        elif elapsed < self.job_duration:
+            status, started, completed = 'in_progress', started_at.isoformat(), None
+        else:
+            status = 'complete'
+            started = started_at.isoformat()
+            completed = (created_at + timedelta(seconds=self.job_duration)).isoformat()
+        return {
+            'job_id': job_id,
+            'job_url': f"/jobs/automated/{job_id}",
+            'type': 'data_sync_all',
+            'status': status,
+            'created_at': created_at.isoformat(),
+            'scheduled_at': created_at.isoformat(),
+            'started_at': started,
+            'completed_at': completed,
+            'params': None,
+        }
+
+
+def batch_responses(requests, key, lookup, to_body):
+    """Build a retrieve_many response, with a per-item 404 for unknown ids"""
+    responses = []
+    for item in requests:
+        item_id = item.get(key)
+        found = lookup.get(item_id)
+        if found is None:
+            responses.append({key: item_id, 'code': 404,
+                              'body': {'code': 404, 'name': 'not_found', 'message': f"{item_id} not found"}})
+        else:
+            responses.append({key: item_id, 'code': 200, 'body': to_body(found, item)})
+    return {'responses': responses}
+
+
+class FakeFinchHandler(BaseHTTPRequestHandler):
+    """Routes Finch API paths to the FakeFinch state on the server"""
+
+    protocol_version = 'HTTP/1.1'
+    # Buffer headers and body into one write and send it right away; separate
+    # small writes on a keep-alive socket stall ~40ms on Nagle + delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, name, message):
+        self.send_json(status, {'code': status, 'name': name, 'message': message})
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_json() if method == 'POST' else {}
+
+        if fake.delay():
+            self.send_error_json(500, 'server_error', 'Injected fake Finch error')
+            return
+
+        # Client-credential endpoints used by the connect flow
+        if method == 'POST' and url.path == '/connect/sessions':
+            self.send_json(200, {'session_id': str(uuid.uuid4()), 'connect_url': 'http://127.0.0.1/fake-connect'})
+            return
+        if method == 'POST' and url.path == '/connect/sessions/reauthenticate':
+            self.send_json(200, {'session_id': str(uuid.uuid4()), 'connect_url': 'http://127.0.0.1/fake-connect'})
+            return
+        if method == 'POST' and url.path == '/auth/token':
+            row = fake.connection_rows()[0]
+            self.send_json(200, {
+                'access_token': row['access_token'], 'token_type': 'bearer',
+                'connection_id': row['connection_id'], 'customer_id': None,
+                'account_id': row['account_id'], 'client_type': 'sandbox',
+                'company_id': row['company_id'], 'connection_type': 'provider',
+                'products': ALL_PRODUCTS, 'provider_id': row['provider_id'],
+            })
+            return
+
+        authorization = self.headers.get('Authorization', '')
+        company = fake.companies.get(authorization[len('Bearer '):]) if authorization.startswith('Bearer ') else None
+        if company is None:
+            self.send_error_json(401, 'invalid_token', 'Unknown access token')
+            return
+
+        route = ROUTES.get((method, url.path))
+        path_args = ()
+        if route is None:
+            for (route_method, pattern), handler in PATTERN_ROUTES:
+                match = pattern.match(url.path) if route_method == method else None
+                if match:
+                    route, path_args = handler, match.groups()
+                    break
+        if route is None:
+            self.send_error_json(404, 'not_found', f"No fake route for {method} {url.path}")
+            return
+
+        status, payload = route(fake, company, query, body, *path_args)
+        self.send_json(status, payload)
+
+
+def get_directory(fake, company, query, body):
+    offset = int(query.get('offset', 0))
+    limit = int(query.get('limit', 100))
+    page = company.individuals[offset:offset + limit]
+    return 200, {
+        'individuals': [company.directory_entry(individual) for individual in page],
+        'paging': {'count': len(company.individuals), 'offset': offset}
+    }
+
+def get_payments(fake, company, query, body):
+    start_date = query.get('start_date', '0000-00-00')
+    end_date = query.get('end_date', '9999-12-31')
+    return 200, [payment for payment in company.payments if start_date <= payment['pay_date'] <= end_date]
+
+def post_pay_statements(fake, company, query, body):
+    def to_body(payment, item):
+        offset = int(item.get('offset') or 0)
+        limit = int(item.get('limit') or 5000)
+        individuals = [company.by_id[individual_id] for individual_id in payment['individual_ids']]
+        return {
+            'paging': {'count': len(individuals), 'offset': offset},
+            'pay_statements': [company.pay_statement(individual) for individual in individuals[offset:offset + limit]]
+        }
+    return 200, batch_responses(body.get('requests', []), 'payment_id', company.payments_by_id, to_body)
+
+def get_enrolled_ids(fake, company, query, body, benefit_id):
+    benefit = company.benefits_by_id.get(benefit_id)
+    if benefit is None:
+        return 404, {'code': 404, 'name': 'not_found', 'message': f"Benefit {benefit_id} not found"}
+    return 200, {'benefit_id': benefit_id, 'individual_ids': benefit['enrolled_ids']}
+
+def get_job(fake, company, query, body, job_id):
+    job = fake.job(company, job_id)
+    if job is None:
+        return 404, {'code': 404, 'name': 'not_found', 'message': f"Job {job_id} not found"}
+    return 200, job
+
+def introspect(fake, company, query, body):
+    return 200, {
+        'id': company.connection_id,
+        'client_id': 'fake-client',
+        'client_type': 'sandbox',
+        'connection_id': company.connection_id,
+        'connection_status': {'status': 'connected'},
+        'connection_type': 'provider',
+        'products': ALL_PRODUCTS,
+        'provider_id': company.provider_id,
+        'account_id': f"fake-account-{company.index}",
+        'company_id': company.company_id,
+        'manual': False,
+        'username': 'fake',
+    }
+
+ROUTES = {
+    ('GET', '/employer/company'): lambda fake, company, query, body: (200, company.company()),
+    ('GET', '/employer/directory'): get_directory,
+    ('POST', '/employer/individual'): lambda fake, company, query, body: (200, batch_responses(
+        body.get('requests', []), 'individual_id', company.by_id, lambda found, item: company.individual(found))),
+    ('POST', '/employer/employment'): lambda fake, company, query, body: (200, batch_responses(
+        body.get('requests', []), 'individual_id', company.by_id, lambda found, item: company.employment(found))),
+    ('GET', '/employer/payment'): get_payments,
+    ('POST', '/employer/pay-statement'): post_pay_statements,
+    ('GET', '/employer/benefits'): lambda fake, company, query, body: (200, [
+        {key: value for key, value in benefit.items() if key != 'enrolled_ids'} for benefit in company.benefits]),
+    ('POST', '/jobs/automated'): lambda fake, company, query, body: (200, fake.create_job(company)),
+    ('GET', '/introspect'): introspect,
+}
+
+PATTERN_ROUTES = [
+    (('GET', re.compile(r'^/employer/benefits/([^/]+)/enrolled$')), get_enrolled_ids),
+    (('GET', re.compile(r'^/jobs/automated/([^/]+)$')), get_job),
+]
+
+
+class FakeFinchServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under benchmark concurrency
+    request_queue_size = 128
+
+def make_server(fake, host='127.0.0.1', port=0):
+    server = FakeFinchServer((host, port), FakeFinchHandler)
+    server.fake = fake
+    return server
+
+def start_server(fake, host='127.0.0.1', port=0):
+    """Serve a FakeFinch on a background thread; returns the server (see server.server_port)"""
+    server = make_server(fake, host, port)
+    threading.Thread(target=server.serve_forever, name='fake-finch', daemon=True).start()
+    return server
+
+
+def add_fake_arguments(parser):
+    """Data-shape and fault-injection options shared with benchmark.py"""
+    parser.add_argument('--companies', type=int, default=1, help='number of fake connections')
+    parser.add_argument('--employees', type=int, default=500, help='employees per company')
+    parser.add_argument('--payments', type=int, default=26, help='pay runs per company (biweekly, most recent first)')
+    parser.add_argument('--benefits', type=int, default=5, help='benefits per company')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='standard deviation of the latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls that return a 500')
+    parser.add_argument('--job-duration', type=float, default=10.0, help='seconds until a fake job completes')
+    parser.add_argument('--seed', type=int, default=0)
+
+def fake_from_arguments(args):
+    return FakeFinch(args.companies, args.employees, args.payments, args.benefits, seed=args.seed,
+                     latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     job_duration=args.job_duration)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    fake = fake_from_arguments(args)
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake Finch listening on http://{args.host}:{args.port}")
+    for row in fake.connection_rows():
+        print(f"  {row['connection_id']} ({row['provider_id']}): access token {row['access_token']}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
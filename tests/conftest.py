@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# app reads its configuration at import time, so point it at a scratch data directory first
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='finch-demo-tests-'))
+os.environ.setdefault('CLIENT_ID', 'test-client')
+os.environ.setdefault('CLIENT_SECRET', 'test-secret')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
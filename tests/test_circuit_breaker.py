@@ -0,0 +1,156 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(app.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker():
+    return app.CircuitBreaker(threshold=3, cooldown=10, max_cooldown=40, probe_timeout=5)
+
+
+def request():
+    return httpx.Request('GET', 'https://api.tryfinch.com/employer/directory')
+
+
+def trip(breaker, provider_id='acme'):
+    for _ in range(breaker.threshold):
+        breaker.record(provider_id, failed=True)
+
+
+def test_opens_after_threshold_failures(clock, breaker):
+    breaker.record('acme', failed=True)
+    breaker.record('acme', failed=True)
+    assert breaker.reject(request(), 'acme') is None
+
+    breaker.record('acme', failed=True)
+    response = breaker.reject(request(), 'acme')
+    assert response.status_code == 503
+    assert response.headers['x-should-retry'] == 'false'
+    assert response.headers['retry-after'] == '10'
+
+
+def test_success_resets_failure_count(clock, breaker):
+    breaker.record('acme', failed=True)
+    breaker.record('acme', failed=True)
+    breaker.record('acme', failed=False)
+    breaker.record('acme', failed=True)
+    assert breaker.reject(request(), 'acme') is None
+
+
+def test_probe_success_closes_circuit(clock, breaker):
+    trip(breaker)
+    clock.now += 10
+
+    assert breaker.reject(request(), 'acme') is None
+    # Only the probe gets through while it is out
+    assert breaker.reject(request(), 'acme').status_code == 503
+
+    breaker.record('acme', failed=False)
+    assert not breaker.is_open('acme')
+    assert breaker.reject(request(), 'acme') is None
+
+
+def test_probe_failure_reopens_with_doubled_cooldown(clock, breaker):
+    trip(breaker)
+    clock.now += 10
+    assert breaker.reject(request(), 'acme') is None
+
+    breaker.record('acme', failed=True)
+    assert breaker.reject(request(), 'acme').headers['retry-after'] == '20'
+
+    clock.now += 20
+    assert breaker.reject(request(), 'acme') is None
+    breaker.record('acme', failed=True)
+    clock.now += 39
+    assert breaker.reject(request(), 'acme').status_code == 503
+    clock.now += 1
+    assert breaker.reject(request(), 'acme') is None
+    breaker.record('acme', failed=True)
+    # Capped at max_cooldown
+    assert breaker.reject(request(), 'acme').headers['retry-after'] == '40'
+
+
+def test_released_probe_lets_next_call_probe(clock, breaker):
+    trip(breaker)
+    clock.now += 10
+    probe = request()
+    assert breaker.reject(probe, 'acme') is None
+
+    # Only the request holding the slot can release it
+    breaker.release('acme', request())
+    assert breaker.reject(request(), 'acme').status_code == 503
+
+    breaker.release('acme', probe)
+    assert breaker.reject(request(), 'acme') is None
+    assert breaker.is_open('acme')
+
+
+def test_abandoned_probe_expires(clock, breaker):
+    trip(breaker)
+    clock.now += 10
+    assert breaker.reject(request(), 'acme') is None
+
+    clock.now += 4
+    assert breaker.reject(request(), 'acme').status_code == 503
+    clock.now += 1
+    assert breaker.reject(request(), 'acme') is None
+
+
+def test_retry_after_keeps_circuit_open(clock, breaker):
+    response = httpx.Response(429, headers={'retry-after': '25'})
+    breaker.record_response('acme', response)
+    assert breaker.reject(request(), 'acme').headers['retry-after'] == '25'
+
+
+def test_providers_are_independent(clock, breaker):
+    trip(breaker, 'acme')
+    assert breaker.reject(request(), 'acme') is not None
+    assert breaker.reject(request(), 'other') is None
+
+
+def test_cancelled_probe_releases_slot_in_transport(clock, breaker, monkeypatch):
+    monkeypatch.setattr(app, 'upstream_circuit', breaker)
+    monkeypatch.setattr(app, 'provider_for_authorization', lambda authorization: 'acme')
+    trip(breaker)
+    clock.now += 10
+
+    class CancelledTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            raise asyncio.CancelledError()
+
+    transport = app.AsyncInstrumentedTransport(CancelledTransport())
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(transport.handle_async_request(request()))
+
+    # The cancelled probe neither closed nor reopened the circuit, and the next call probes
+    assert breaker.is_open('acme')
+    assert breaker.reject(request(), 'acme') is None
+
+
+def test_failed_probe_reopens_in_transport(clock, breaker, monkeypatch):
+    monkeypatch.setattr(app, 'upstream_circuit', breaker)
+    monkeypatch.setattr(app, 'provider_for_authorization', lambda authorization: 'acme')
+    trip(breaker)
+    clock.now += 10
+
+    transport = app.InstrumentedTransport(httpx.MockTransport(lambda request: httpx.Response(502)))
+    assert transport.handle_request(request()).status_code == 502
+    assert transport.handle_request(request()).headers['x-circuit-open'] == 'true'
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import app
+
+
+def stale_cache(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, 'monotonic', lambda: now[0])
+    cache = app.ConnectionCache(ttl=60)
+    assert cache.get('connection-1', lambda: 'first') == 'first'
+    now[0] += 61
+    return cache
+
+
+def test_fresh_entry_is_served_from_cache():
+    cache = app.ConnectionCache(ttl=60)
+    assert cache.get('connection-1', lambda: 'first') == 'first'
+    assert cache.get('connection-1', lambda: 'second') == 'first'
+
+
+def test_stale_entry_refreshes_with_refresh_callable(monkeypatch):
+    cache = stale_cache(monkeypatch)
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return 'refreshed'
+
+    def fetch():
+        raise AssertionError('the request-path fetch must not be used for background refreshes')
+
+    assert cache.get('connection-1', fetch, refresh) == 'first'
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache.peek('connection-1', fetch) == 'refreshed':
+            break
+        time.sleep(0.01)
+    assert cache.peek('connection-1', fetch) == 'refreshed'
+
+
+def test_stale_entry_refreshes_with_fetch_by_default(monkeypatch):
+    cache = stale_cache(monkeypatch)
+    refreshed = threading.Event()
+
+    def fetch():
+        refreshed.set()
+        return 'refreshed'
+
+    assert cache.get('connection-1', fetch) == 'first'
+    assert refreshed.wait(5)
+
+
+def test_invalidate_discards_refresh_in_flight(monkeypatch):
+    cache = stale_cache(monkeypatch)
+    release = threading.Event()
+    done = threading.Event()
+
+    def refresh():
+        release.wait(5)
+        done.set()
+        return 'old generation'
+
+    cache.get('connection-1', refresh)
+    cache.invalidate('connection-1')
+    release.set()
+    assert done.wait(5)
+    assert cache.get('connection-1', lambda: 'new generation') == 'new generation'
@@ -0,0 +1,123 @@
+import csv
+import os
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'tokens.csv')
+
+
+def connection(connection_id, **fields):
+    return {'connection_id': connection_id, 'access_token': f'token-{connection_id}',
+            'provider_id': 'gusto', 'products': 'company|directory', **fields}
+
+
+def test_empty_without_file(path):
+    registry = app.ConnectionRegistry(path)
+    assert registry.all() == []
+    assert registry.active() is None
+    assert registry.get('missing') is None
+
+
+def test_upsert_adds_and_activates(path):
+    registry = app.ConnectionRegistry(path)
+    assert registry.upsert(connection('a')) is False
+    assert registry.upsert(connection('b')) is False
+
+    assert [conn['connection_id'] for conn in registry.all()] == ['a', 'b']
+    assert registry.active()['connection_id'] == 'b'
+    assert registry.get('a')['access_token'] == 'token-a'
+    assert registry.get('a')['active'] == 'False'
+
+
+def test_upsert_updates_existing_connection(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.upsert(connection('b'))
+
+    assert registry.upsert({'connection_id': 'a', 'access_token': 'rotated'}) is True
+    assert len(registry.all()) == 2
+    assert registry.get('a')['access_token'] == 'rotated'
+    assert registry.get('a')['provider_id'] == 'gusto'
+    assert registry.active()['connection_id'] == 'a'
+    assert registry.provider_for_token('rotated') == 'gusto'
+    assert registry.provider_for_token('token-a') is None
+
+
+def test_lookups_return_copies(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.get('a')['access_token'] = 'changed'
+    registry.active()['access_token'] = 'changed'
+    assert registry.get('a')['access_token'] == 'token-a'
+
+
+def test_set_active(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.upsert(connection('b'))
+
+    assert registry.set_active('a') is True
+    assert registry.active()['connection_id'] == 'a'
+    assert registry.set_active('missing') is False
+    assert registry.active()['connection_id'] == 'a'
+
+
+def test_persists_across_restarts(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.upsert(connection('b'))
+    registry.set_active('a')
+    registry.update_products('b', ['payment'])
+
+    restarted = app.ConnectionRegistry(path)
+    assert [conn['connection_id'] for conn in restarted.all()] == ['a', 'b']
+    assert restarted.active()['connection_id'] == 'a'
+    assert restarted.products('b') == frozenset({'payment'})
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        assert csv.DictReader(csvfile).fieldnames == app.TOKENS_CSV_HEADERS
+
+
+def test_picks_up_external_edits(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.all()
+
+    other = app.ConnectionRegistry(path)
+    other.upsert(connection('b', provider_id='adp'))
+    # Make sure the file signature changes even on coarse mtime filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert registry.get('b')['provider_id'] == 'adp'
+    assert registry.active()['connection_id'] == 'b'
+
+
+def test_falls_back_to_latest_connection_when_none_active(path):
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=app.TOKENS_CSV_HEADERS)
+        writer.writeheader()
+        writer.writerow({**connection('a'), 'active': 'False'})
+        writer.writerow({**connection('b'), 'active': ''})
+
+    assert app.ConnectionRegistry(path).active()['connection_id'] == 'b'
+
+
+def test_products(path):
+    registry = app.ConnectionRegistry(path)
+    registry.upsert(connection('a'))
+    registry.upsert(connection('unknown', products=''))
+
+    assert registry.products('a') == frozenset({'company', 'directory'})
+    assert registry.products('unknown') is None
+
+    registry.revoke_products('a', ['directory'])
+    assert registry.products('a') == frozenset({'company'})
+    # Revoking the last product is recorded, not confused with never recorded
+    registry.revoke_products('a', ['company'])
+    assert registry.products('a') == frozenset()
+    assert app.ConnectionRegistry(path).products('a') == frozenset()
@@ -0,0 +1,21 @@
+import threading
+
+import app
+
+
+def test_track_during_a_poll_is_not_lost(monkeypatch):
+    poller = app.JobPoller()
+    polled_again = threading.Event()
+    calls = []
+
+    def poll_due_jobs():
+        calls.append(1)
+        if len(calls) == 1:
+            poller.track('job-1')
+        else:
+            polled_again.set()
+        return 60
+
+    monkeypatch.setattr(poller, '_poll_due_jobs', poll_due_jobs)
+    poller.start()
+    assert polled_again.wait(timeout=5)
@@ -0,0 +1,74 @@
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    return app.JobStore(str(tmp_path / 'jobs.db'))
+
+
+def job(job_id, connection_id='c1', created_at='2026-01-01T00:00:00', **fields):
+    return {'job_id': job_id, 'connection_id': connection_id, 'job_type': 'data_sync_all',
+            'status': 'pending', 'created_at': created_at, **fields}
+
+
+def test_save_and_get(store):
+    store.save(job('j1', allowed_refreshes=3))
+    saved = store.get('j1')
+    assert saved['status'] == 'pending'
+    assert saved['allowed_refreshes'] == '3'
+    assert saved['completed_at'] == ''
+    assert store.get('missing') is None
+
+
+def test_for_connection_newest_first(store):
+    store.save(job('old', created_at='2026-01-01T00:00:00'))
+    store.save(job('new', created_at='2026-01-02T00:00:00'))
+    store.save(job('other', connection_id='c2'))
+    assert [saved['job_id'] for saved in store.for_connection('c1')] == ['new', 'old']
+
+
+def test_update(store):
+    store.save(job('j1'))
+    assert store.update('j1', {'status': 'complete', 'completed_at': '2026-01-01T00:05:00', 'unknown': 'x'})
+    assert store.get('j1')['status'] == 'complete'
+    assert store.update('j1', {}) is True
+    assert store.update('missing', {'status': 'complete'}) is False
+
+
+def test_with_status(store):
+    store.save(job('j1'))
+    store.save(job('j2', status='complete'))
+    assert [saved['job_id'] for saved in store.with_status(['pending', 'in_progress'])] == ['j1']
+
+
+def test_delete_created_before_keeps_unparseable_dates(store):
+    now = datetime.now()
+    store.save(job('old', created_at=(now - timedelta(days=40)).isoformat()))
+    store.save(job('recent', created_at=now.isoformat()))
+    store.save(job('undated', created_at='unknown'))
+    assert store.delete_created_before(now - timedelta(days=30)) == 1
+    assert store.get('old') is None
+    assert store.get('recent') and store.get('undated')
+
+
+def test_imports_jobs_csv_once(tmp_path):
+    csv_path = tmp_path / 'jobs.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['job_id', 'connection_id', 'status', 'created_at'])
+        writer.writeheader()
+        writer.writerow({'job_id': 'j1', 'connection_id': 'c1', 'status': 'complete', 'created_at': '2026-01-01'})
+
+    store = app.JobStore(str(tmp_path / 'jobs.db'), csv_path=str(csv_path))
+    assert store.get('j1')['status'] == 'complete'
+    assert not csv_path.exists()
+    assert (tmp_path / 'jobs.csv.migrated').exists()
+
+
+def test_persists_across_restarts(store, tmp_path):
+    store.save(job('j1'))
+    assert app.JobStore(str(tmp_path / 'jobs.db')).get('j1')['connection_id'] == 'c1'
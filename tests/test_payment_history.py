@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+TODAY = date.today()
+
+
+def day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+
+class Payments:
+    """Stub for client.hris.payments that records every list() window"""
+
+    def __init__(self, *pay_dates):
+        self.pay_dates = list(pay_dates)
+        self.calls = []
+
+    def list(self, start_date, end_date):
+        if start_date > end_date:
+            raise ValueError(f"inverted range {start_date} > {end_date}")
+        self.calls.append((start_date, end_date))
+        return [
+            SimpleNamespace(id=f"payment-{pay_date}", pay_date=pay_date, pay_period=None, individual_ids=['ind-1'])
+            for pay_date in self.pay_dates if start_date <= pay_date <= end_date
+        ]
+
+
+def client(payments):
+    return SimpleNamespace(hris=SimpleNamespace(payments=payments))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'PAYMENT_SYNC_INTERVAL', 0)
+    return app.PaymentHistoryStore(str(tmp_path / 'payment_history.db'))
+
+
+def pay_dates(records):
+    return [record['pay_date'] for record in records]
+
+
+def test_first_request_syncs_window(store):
+    payments = Payments(day(-100), day(-30), day(-1))
+    assert pay_dates(store.get_payments(client(payments), 'c1', day(-90), day(0))) == [day(-30), day(-1)]
+    assert payments.calls == [(day(-90), day(0))]
+
+
+def test_backfills_older_range(store):
+    payments = Payments(day(-100), day(-30))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    records = store.get_payments(client(payments), 'c1', day(-120), day(-60))
+    assert pay_dates(records) == [day(-100)]
+    assert payments.calls[1] == (day(-120), day(-90))
+
+
+def test_past_window_inside_synced_range_is_served_locally(store):
+    payments = Payments(day(-30))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    assert pay_dates(store.get_payments(client(payments), 'c1', day(-40), day(-20))) == [day(-30)]
+    assert len(payments.calls) == 1
+
+
+def test_window_reaching_today_syncs_from_high_water_mark(store):
+    payments = Payments(day(-30))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    payments.pay_dates.append(day(0))
+    assert pay_dates(store.get_payments(client(payments), 'c1', day(-90), day(0))) == [day(-30), day(0)]
+    assert payments.calls[1] == (day(-30), day(0))
+
+
+def test_future_dated_payment_does_not_invert_the_range(store):
+    payments = Payments(day(-30), day(1))
+    store.get_payments(client(payments), 'c1', day(-90), day(5))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    assert payments.calls[1] == (day(0), day(0))
+
+
+def test_recent_sync_is_reused(store, monkeypatch):
+    monkeypatch.setattr(app, 'PAYMENT_SYNC_INTERVAL', 60)
+    payments = Payments(day(-30))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    store.get_payments(client(payments), 'c1', day(-90), day(0))
+    assert len(payments.calls) == 1
+
+
+def test_connections_are_kept_apart(store):
+    store.get_payments(client(Payments(day(-30))), 'c1', day(-90), day(0))
+    assert store.get_payments(client(Payments()), 'c2', day(-90), day(0)) == []
+
+
+def test_history_survives_restart(store, tmp_path):
+    store.get_payments(client(Payments(day(-30))), 'c1', day(-90), day(-10))
+    restarted = app.PaymentHistoryStore(str(tmp_path / 'payment_history.db'))
+    payments = Payments()
+    assert pay_dates(restarted.get_payments(client(payments), 'c1', day(-60), day(-20))) == [day(-30)]
+    assert payments.calls == []
+
+
+def test_unreadable_database_is_moved_aside(tmp_path):
+    path = tmp_path / 'payment_history.db'
+    path.write_bytes(b'not a database' * 100)
+    store = app.PaymentHistoryStore(str(path))
+    assert pay_dates(store.get_payments(client(Payments(day(-30))), 'c1', day(-90), day(0))) == [day(-30)]
+    assert (tmp_path / 'payment_history.db.corrupt').exists()
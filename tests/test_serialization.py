@@ -0,0 +1,58 @@
+import pytest
+from finch.types.hris import CompanyBenefit
+
+import app
+
+
+def benefit(**fields):
+    return CompanyBenefit.construct(**{'benefit_id': 'b1', 'type': '401k', **fields})
+
+
+def test_parse_fields_builds_a_tree():
+    assert app.parse_fields('a, b.c,b.d,,') == {'a': {}, 'b': {'c': {}, 'd': {}}}
+    assert app.parse_fields('') is None
+    assert app.parse_fields(None) is None
+
+
+@pytest.mark.parametrize('fields', ['a..b', 'a.', '.a', 'a. .b'])
+def test_parse_fields_rejects_empty_segments(fields):
+    with pytest.raises(ValueError):
+        app.parse_fields(fields)
+
+
+def test_models_leave_out_unset_fields():
+    assert app.to_json_data(benefit()) == {'benefit_id': 'b1', 'type': '401k'}
+
+
+def test_nested_models_and_lists_are_converted():
+    data = app.to_json_data({'benefits': [benefit(company_contribution={'type': 'match', 'tiers': []})]})
+    assert data == {'benefits': [{'benefit_id': 'b1', 'type': '401k',
+                                  'company_contribution': {'type': 'match', 'tiers': []}}]}
+
+
+def test_projection_keeps_only_requested_paths():
+    data = {'benefits': [benefit(description='Retirement')], 'total_benefits': 1}
+    projected = app.to_json_data(data, app.parse_fields('benefits.benefit_id,total_benefits'))
+    assert projected == {'benefits': [{'benefit_id': 'b1'}], 'total_benefits': 1}
+
+
+def test_projection_ignores_missing_keys():
+    assert app.to_json_data({'a': 1}, app.parse_fields('a,b.c')) == {'a': 1}
+
+
+def test_projection_wildcard_matches_every_key():
+    data = {'employees': {'e1': {'name': 'Al', 'title': 'CEO'}, 'e2': {'name': 'Bea', 'title': 'CTO'}}}
+    projected = app.to_json_data(data, app.parse_fields('employees.*.title'))
+    assert projected == {'employees': {'e1': {'title': 'CEO'}, 'e2': {'title': 'CTO'}}}
+
+
+def test_routes_reject_bad_fields():
+    client = app.app.test_client()
+    response = client.get('/api/directory?fields=individuals..id')
+    assert response.status_code == 400
+    assert 'individuals..id' in response.get_json()['error']
+
+
+def test_async_routes_reject_bad_fields():
+    response = app.app.test_client().get('/api/employee/e1?fields=individual.')
+    assert response.status_code == 400
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from finch import APITimeoutError
+
+import app
+
+KEY = ('connection-1', 'hris.directory.list', 0, 500)
+
+
+class CountingFlight(app.SingleFlight):
+    """SingleFlight that lets a test wait until followers have joined"""
+
+    def __init__(self):
+        super().__init__()
+        self.followers = 0
+        self._joined = threading.Condition()
+
+    def _join(self, key):
+        future, leader = super()._join(key)
+        if not leader:
+            with self._joined:
+                self.followers += 1
+                self._joined.notify_all()
+        return future, leader
+
+    def wait_for_followers(self, count, timeout=5):
+        with self._joined:
+            assert self._joined.wait_for(lambda: self.followers >= count, timeout)
+
+
+class Upstream:
+    """Call that blocks until released and counts how often it ran"""
+
+    def __init__(self, result='directory', error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def call_async(self):
+        self.calls += 1
+        while not self.release.is_set():
+            await asyncio.sleep(0.001)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_concurrently(flight, call, callers):
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(flight.do, KEY, call) for _ in range(callers)]
+        flight.wait_for_followers(callers - 1)
+        call.release.set()
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_callers_share_one_call():
+    flight = CountingFlight()
+    upstream = Upstream()
+    assert run_concurrently(flight, upstream, 5) == ['directory'] * 5
+    assert upstream.calls == 1
+
+
+def test_concurrent_callers_share_the_error():
+    flight = CountingFlight()
+    error = ValueError('upstream failed')
+    upstream = Upstream(error=error)
+    assert run_concurrently(flight, upstream, 5) == [error] * 5
+    assert upstream.calls == 1
+
+
+def test_nothing_is_kept_after_the_call():
+    flight = app.SingleFlight()
+    calls = []
+    assert flight.do(KEY, lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do(KEY, lambda: calls.append(1) or len(calls)) == 2
+
+
+def test_different_keys_do_not_share():
+    flight = app.SingleFlight()
+    assert flight.do(KEY, lambda: 'a') == 'a'
+    assert flight.do(KEY[:3] + (1000,), lambda: 'b') == 'b'
+
+
+def test_async_callers_share_one_call():
+    flight = CountingFlight()
+    upstream = Upstream()
+
+    async def main():
+        tasks = [asyncio.create_task(flight.do_async(KEY, upstream.call_async)) for _ in range(5)]
+        await asyncio.to_thread(flight.wait_for_followers, 4)
+        upstream.release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == ['directory'] * 5
+    assert upstream.calls == 1
+
+
+def test_sync_follower_shares_async_leader_result():
+    flight = CountingFlight()
+    upstream = Upstream()
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async(KEY, upstream.call_async))
+        await asyncio.sleep(0)
+        follower = asyncio.get_running_loop().run_in_executor(None, flight.do, KEY, upstream)
+        await asyncio.to_thread(flight.wait_for_followers, 1)
+        upstream.release.set()
+        return await asyncio.gather(leader, follower)
+
+    assert asyncio.run(main()) == ['directory', 'directory']
+    assert upstream.calls == 1
+
+
+def test_cancelled_async_leader_gives_followers_a_timeout():
+    flight = CountingFlight()
+    upstream = Upstream()
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async(KEY, upstream.call_async))
+        await asyncio.sleep(0)
+        async_follower = asyncio.create_task(flight.do_async(KEY, upstream.call_async))
+        sync_follower = asyncio.get_running_loop().run_in_executor(None, flight.do, KEY, upstream)
+        await asyncio.to_thread(flight.wait_for_followers, 2)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(async_follower, sync_follower, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(result) for result in results] == [APITimeoutError, APITimeoutError]
+    assert upstream.calls == 1
+
+
+def test_cancelled_follower_leaves_the_flight_running():
+    flight = CountingFlight()
+    upstream = Upstream()
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async(KEY, upstream.call_async))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do_async(KEY, upstream.call_async)) for _ in range(2)]
+        await asyncio.to_thread(flight.wait_for_followers, 2)
+        followers[0].cancel()
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    leader, cancelled, follower = asyncio.run(main())
+    assert (leader, follower) == ('directory', 'directory')
+    assert isinstance(cancelled, asyncio.CancelledError)
+    assert upstream.calls == 1
@@ -0,0 +1,81 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    return app.SnapshotStore(str(tmp_path / 'snapshots.db'))
+
+
+def individual(individual_id, first_name):
+    return (individual_id, {'id': individual_id, 'first_name': first_name})
+
+
+def test_no_snapshot_until_first_sync(store):
+    assert store.info('c1') is None
+    assert not store.has('c1', 'directory')
+    assert store.records('c1', 'directory') == []
+    assert store.record('c1', 'company') is None
+
+
+def test_replace_stores_records_in_sync_order(store):
+    store.replace('c1', {
+        'company': [('', {'id': 'company-1', 'legal_name': 'Acme'})],
+        'directory': [individual('b', 'Bea'), individual('a', 'Al')],
+    }, {})
+
+    info = store.info('c1')
+    assert info['connection_id'] == 'c1'
+    assert info['errors'] == {}
+    assert info['synced_at']
+    assert [person.id for person in store.records('c1', 'directory')] == ['b', 'a']
+    assert store.record('c1', 'directory', 'a').first_name == 'Al'
+    assert store.record('c1', 'company').legal_name == 'Acme'
+
+
+def test_replace_drops_records_missing_from_the_new_sync(store):
+    store.replace('c1', {'directory': [individual('a', 'Al'), individual('b', 'Bea')]}, {})
+    store.replace('c1', {'directory': [individual('b', 'Bee')]}, {})
+
+    assert [person.id for person in store.records('c1', 'directory')] == ['b']
+    assert store.record('c1', 'directory', 'b').first_name == 'Bee'
+    assert store.record('c1', 'directory', 'a') is None
+
+
+def test_replace_keeps_kinds_that_were_not_loaded(store):
+    store.replace('c1', {
+        'directory': [individual('a', 'Al')],
+        'individual': [individual('a', 'Al')],
+    }, {})
+    store.replace('c1', {'directory': [individual('a', 'Al'), individual('b', 'Bea')]},
+                  {'individual': 'Individual data unsupported for provider'})
+
+    assert [person.id for person in store.records('c1', 'individual')] == ['a']
+    assert store.info('c1')['errors'] == {'individual': 'Individual data unsupported for provider'}
+    assert len(store.records('c1', 'directory')) == 2
+
+
+def test_errors_clear_on_the_next_successful_sync(store):
+    store.replace('c1', {}, {'company': 'Could not load company data.'})
+    store.replace('c1', {'company': [('', {'legal_name': 'Acme'})]}, {})
+    assert store.info('c1')['errors'] == {}
+
+
+def test_connections_are_kept_apart(store):
+    store.replace('c1', {'directory': [individual('a', 'Al')]}, {})
+    store.replace('c2', {'directory': []}, {})
+
+    assert store.records('c2', 'directory') == []
+    assert len(store.records('c1', 'directory')) == 1
+
+
+def test_enrollments_stay_plain_data(store):
+    store.replace('c1', {'enrollment': [('benefit-1', {'individual_ids': ['a']})]}, {})
+    assert store.record('c1', 'enrollment', 'benefit-1') == {'individual_ids': ['a']}
+
+
+def test_survives_restart(store, tmp_path):
+    store.replace('c1', {'directory': [individual('a', 'Al')]}, {})
+    restarted = app.SnapshotStore(str(tmp_path / 'snapshots.db'))
+    assert restarted.record('c1', 'directory', 'a').first_name == 'Al'
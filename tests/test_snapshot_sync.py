@@ -0,0 +1,69 @@
+import json
+
+import httpx
+import pytest
+from finch import Finch
+
+import app
+
+PEOPLE = [{'id': 'a', 'first_name': 'Al'}, {'id': 'b', 'first_name': 'Bea'}]
+
+
+class Provider:
+    """Just enough of the Finch API for a snapshot sync, with switchable failures"""
+
+    def __init__(self):
+        self.people = list(PEOPLE)
+        self.failing = {}
+
+    def handle(self, request):
+        path = request.url.path
+        if path in self.failing:
+            return httpx.Response(self.failing[path], json={'message': 'Not implemented', 'code': self.failing[path]})
+        if path == '/employer/company':
+            return httpx.Response(200, json={'id': 'company-1', 'legal_name': 'Acme'})
+        if path == '/employer/directory':
+            return httpx.Response(200, json={'individuals': self.people,
+                                             'paging': {'count': len(self.people), 'offset': 0}})
+        if path in ('/employer/individual', '/employer/employment'):
+            ids = [item['individual_id'] for item in json.loads(request.content)['requests']]
+            return httpx.Response(200, json={'responses': [
+                {'individual_id': individual_id, 'code': 200, 'body': {'id': individual_id}} for individual_id in ids]})
+        if path == '/employer/benefits':
+            return httpx.Response(200, json=[])
+        return httpx.Response(404, json={'message': 'Not found'})
+
+
+@pytest.fixture
+def provider(monkeypatch, tmp_path):
+    provider = Provider()
+    client = Finch(access_token='token', base_url='http://finch.test', max_retries=0,
+                   http_client=httpx.Client(transport=httpx.MockTransport(provider.handle)))
+    monkeypatch.setattr(app, 'get_finch_client', lambda access_token=None: client)
+    monkeypatch.setattr(app, 'snapshot_store', app.SnapshotStore(str(tmp_path / 'snapshots.db')))
+    return provider
+
+
+def sync():
+    return app.sync_snapshot({'connection_id': 'c1', 'access_token': 'token'})
+
+
+def test_sync_stores_every_section(provider):
+    info = sync()
+    assert info['errors'] == {}
+    assert [person.id for person in app.snapshot_store.records('c1', 'directory')] == ['a', 'b']
+    assert [person.id for person in app.snapshot_store.records('c1', 'individual')] == ['a', 'b']
+    assert app.snapshot_store.record('c1', 'company').legal_name == 'Acme'
+
+
+def test_failed_retrieve_many_keeps_previous_individuals(provider):
+    sync()
+    provider.people.append({'id': 'c', 'first_name': 'Cy'})
+    provider.failing['/employer/individual'] = 501
+
+    info = sync()
+
+    assert 'individual' in info['errors']
+    assert [person.id for person in app.snapshot_store.records('c1', 'individual')] == ['a', 'b']
+    assert [person.id for person in app.snapshot_store.records('c1', 'employment')] == ['a', 'b', 'c']
+    assert len(app.snapshot_store.records('c1', 'directory')) == 3